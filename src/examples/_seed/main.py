@@ -16,26 +16,27 @@ from oddimorf import Style
 async def loop_async(context, config):
     """ Primary execution logic of the sub-system. """
     # -------------------------------------------------------------------------
-    # Incoming/Read queue
-    readQueue = context.input_channel.queue
-    # -------------------------------------------------------------------------
     # Outgoing/Write queues
     # TODO
     # -------------------------------------------------------------------------
     # Control setup
     # TODO
     # -------------------------------------------------------------------------
-    # Processing loop
-    while not context.is_terminated:
-        if not context.is_running or not readQueue or readQueue.empty():
-            await asyncio.sleep(0.1)
+    # Input column projection, where only some of the incoming fields are used (optional)
+    # context.input_channel.select_columns([0, 4])
+    # -------------------------------------------------------------------------
+    # Processing loop, over incoming batches handed over on arrival (or whole sectors/scans through
+    # input_channel.windows), until terminated
+    async for batch in context.input_channel.batches(max_items=4096, max_latency=0.05):
+        if context.is_terminated:
+            break
+        if not context.is_running:
             continue
         # ---------------------------------------------------------------------
         # TODO
-        while context.is_running and readQueue and not readQueue.empty():
-            for todo in context.input_channel.unpack():
-                # TODO
-                None
+        for todo in batch:
+            # TODO
+            None
 
 
 async def main():
@@ -59,8 +59,7 @@ class Reader(threading.Thread):
                              self.sensor_origin[0], self.sensor_origin[1])
             struct.pack_into('<Q', buffer, 40, 4000)
             while self.is_running:
-                time.sleep(0.1)
-                if self.channel.queue.empty():
+                if not self.channel.wait(0.1):
                     continue
                 for packet in self.channel.unpack():
                     struct.pack_into('<l', buffer, 16, rabbit)
@@ -156,18 +155,18 @@ class Interpreter(threading.Thread):
 class Writer(threading.Thread):
     """ Thread used to write outgoing data from a specific logic engine output MMF. """
 
-    def __init__(self, key, pipe):
+    def __init__(self, key, output_channel):
         super().__init__()
         self.is_running = True
         self.key = key
-        self.pipe = pipe
+        self.output_channel = output_channel
+        self.pipe = output_channel.pipes[key]
         self.rabbit = 0
         self.struct_format = self.pipe['struct_format']
         self.field_formats = self.pipe['struct_field_formats']
-        self.queue = self.pipe['queue']
-        self.struct_size = pipe['struct_size']
-        self.field_sizes = pipe['struct_field_sizes']
-        max_size_bytes = pipe['struct_size'] * max_outgoing_buffer_items
+        self.struct_size = self.pipe['struct_size']
+        self.field_sizes = self.pipe['struct_field_sizes']
+        max_size_bytes = self.pipe['struct_size'] * max_outgoing_buffer_items
         # ---------------------------------------------------------------------
         with open(os.path.join(os.path.dirname(__file__), f"_{self.key}.dat"), "wb") as file:
             file.truncate(header_size_bytes + max_size_bytes)
@@ -194,7 +193,7 @@ class Writer(threading.Thread):
                     field_format, buffer, block_start + ((j + from_index) * field_size))[0]
             block_start = block_start + \
                 (max_outgoing_buffer_items * field_size)
-        [self.queue.put(items[j]) for j in range(to_index - from_index - 1)]
+        self.output_channel.put_many(self.key, items)
 
     def run(self):
         """ Start the reader thread loop. """
@@ -237,7 +236,7 @@ async def loop_async(context, config):
     # -------------------------------------------------------------------------
     # Outgoing/Write queues
     for key in context.output_channel.stream_keys:
-        writers.append(Writer(key, context.output_channel.pipes[key]))
+        writers.append(Writer(key, context.output_channel))
     # -------------------------------------------------------------------------
     # Control setup
     # TODO
@@ -34,7 +34,6 @@ tan_05 = math.tan(0.5 * math.pi / 180)
 
 async def loop_async(context, _):
     """ Primary execution logic of the sub-system. """
-    queue = context.output_channel.pipes['Raw']['queue']
     block_sequence = 0
     comp_start_time_msec = round(time.time_ns() * 1E-6)
     plot_radials = []
@@ -49,6 +48,8 @@ async def loop_async(context, _):
             continue
         start_angle = block_sequence * block_azimuth_span
         comp_start_time_msec = round(time.time_ns() * 1E-6)
+        # Records of the block, enqueued at once
+        records = []
         for _ in range(0, int(context.controls[0].value)):
             # -----------------------------------------------------------------
             if context.is_terminated:
@@ -60,7 +61,7 @@ async def loop_async(context, _):
             intensity = random.randint(0, cutoff_clutter_intensity)
             speed = random.randint(0, cutoff_clutter_speed_ms)
             # -----------------------------------------------------------------
-            queue.put([
+            records.append([
                 comp_start_time_msec,
                 rng,
                 az,
@@ -80,13 +81,14 @@ async def loop_async(context, _):
                 cutoff_clutter_intensity + 1, max_clutter_intensity)
             speed = plot_radials[block_sequence][j][0] * tan_05
             # -----------------------------------------------------------------
-            queue.put([
+            records.append([
                 comp_start_time_msec,
                 plot_radials[block_sequence][j][0],
                 plot_radials[block_sequence][j][1],
                 speed,
                 intensity
             ])
+        context.output_channel.put_many('Raw', records)
         comp_delta_time_msec = round(
             time.time_ns() * 1E-6) - comp_start_time_msec
         block_sequence = (block_sequence + 1) % blocks_count
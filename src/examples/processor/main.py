@@ -17,35 +17,34 @@ from oddimorf import Style
 async def loop_async(context, _):
     """ Primary execution logic of the sub-system. """
     # -------------------------------------------------------------------------
-    # Incoming/Read queue
-    readQueue = context.input_channel.queue
-    # -------------------------------------------------------------------------
-    # Outgoing/Write queues
-    clutterWriteQueue = context.output_channel.pipes['ClutterMap']['queue']
-    plotsWriteQueue = context.output_channel.pipes['Plots']['queue']
-    # -------------------------------------------------------------------------
     destination = [0, 0]
     intensity = 0
     intensity_value = 0
     range_value = 0
     azimuth_value = 0
     # -------------------------------------------------------------------------
-    while not context.is_terminated:
-        if not context.is_running or not readQueue or readQueue.empty():
-            await asyncio.sleep(0.1)
+    # Incoming batches, handed over on arrival, until terminated
+    async for batch in context.input_channel.batches(max_items=4096, max_latency=0.05):
+        if context.is_terminated:
+            break
+        if not context.is_running:
             continue
-        while context.is_running and clutterWriteQueue and readQueue and not readQueue.empty():
-            for time_ms, range, azimuth, speed, intensity in context.input_channel.unpack():
-                range_value = float(range)
-                azimuth_value = float(azimuth)
-                destination = distance(meters=range_value).destination(
-                    context.sensor_origin, azimuth_value)
-                intensity_value = float(intensity)
-                clutterWriteQueue.put(
-                    [destination.latitude, destination.longitude, intensity_value])
-                if intensity_value >= context.controls[0].value:
-                    plotsWriteQueue.put([int(time_ms), destination.latitude, destination.longitude, range_value, azimuth_value, float(
-                        speed), 1 if (intensity_value >= 18) else 2 if (intensity_value >= 16) else 3])
+        # Records derived from the batch, enqueued at once
+        clutter_records = []
+        plots_records = []
+        for time_ms, range, azimuth, speed, intensity in batch:
+            range_value = float(range)
+            azimuth_value = float(azimuth)
+            destination = distance(meters=range_value).destination(
+                context.sensor_origin, azimuth_value)
+            intensity_value = float(intensity)
+            clutter_records.append(
+                [destination.latitude, destination.longitude, intensity_value])
+            if intensity_value >= context.controls[0].value:
+                plots_records.append([int(time_ms), destination.latitude, destination.longitude, range_value, azimuth_value, float(
+                    speed), 1 if (intensity_value >= 18) else 2 if (intensity_value >= 16) else 3])
+        context.output_channel.put_many('ClutterMap', clutter_records)
+        context.output_channel.put_many('Plots', plots_records)
 
 
 async def main():
@@ -107,8 +107,7 @@ class Recorder(threading.Thread):
                     if self.output_directory != prev_output_directory:
                         file_sequence = 0
                         break
-                    time.sleep(0.1)
-                    if self.channel.queue.empty():
+                    if not self.channel.wait(0.1):
                         continue
                     for p in self.channel.unpack():
                         packets.append(p)
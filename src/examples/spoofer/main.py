@@ -19,12 +19,6 @@ from geopy.distance import distance
 async def loop_async(context, _):
     """ Primary execution logic of the sub-system. """
     # -------------------------------------------------------------------------
-    # Outgoing/Write queues
-    cluttermap_queue = context.output_channel.pipes['ClutterMap']['queue']
-    plots_queue = context.output_channel.pipes['Plots']['queue']
-    strobes_queue = context.output_channel.pipes['Strobes']['queue']
-    tracks_queue = context.output_channel.pipes['Tracks']['queue']
-    # -------------------------------------------------------------------------
     # Control setup
     interval_slider = context.controls[0]
     cluttermap_mode = context.controls[1]
@@ -65,28 +59,20 @@ async def loop_async(context, _):
             block_send_time_msec = current_time_msec
         await asyncio.sleep(max(block_send_time_msec - current_time_msec, 1) * 1E-03)
         # ---------------------------------------------------------------------
+        # Buffers are filled in reverse order, so enqueued reversed (as popped previously)
         if cluttermap_slider.value > 0:
-            while len(_cluttermap_buffer) > 0:
-                cluttermap_queue.put(_cluttermap_buffer.pop())
-        else:
-            _cluttermap_buffer.clear()
+            context.output_channel.put_many('ClutterMap', reversed(_cluttermap_buffer))
+        _cluttermap_buffer.clear()
         if context.is_running and plots_slider.value > 0:
-            while len(_plots_buffer) > 0:
-                plots_queue.put(_plots_buffer.pop())
-        else:
-            _plots_buffer.clear()
+            context.output_channel.put_many('Plots', reversed(_plots_buffer))
+        _plots_buffer.clear()
         if context.is_running and strobes_slider.value > 0:
-            while len(_strobes_buffer) > 0:
-                strobes_queue.put(_strobes_buffer.pop())
-        else:
-            _strobes_buffer.clear()
+            context.output_channel.put_many('Strobes', reversed(_strobes_buffer))
+        _strobes_buffer.clear()
         if context.is_running and tracks_slider.value > 0:
-            if tracks_mode.selected == 0:
-                while len(_tracks_buffer) > 0:
-                    tracks_queue.put(_tracks_buffer.pop())
-            elif sector_count % 16 == 0:
-                while len(_tracks_buffer) > 0:
-                    tracks_queue.put(_tracks_buffer.pop())
+            if (tracks_mode.selected == 0) or (sector_count % 16 == 0):
+                context.output_channel.put_many('Tracks', reversed(_tracks_buffer))
+                _tracks_buffer.clear()
         else:
             _tracks_buffer.clear()
         # ---------------------------------------------------------------------
@@ -1,6 +1,6 @@
 # __init__.py
 """ Package classes/function of modules in this directory. """
-from .base import Event, Endpoint, Protocol, Status, Style, timestamp
+from .base import Event, Endpoint, Overflow, Protocol, Status, Style, Window, timestamp
 from .components import input_channel, output_channel
 from .controls import  checkbox, radio, slider, textbox
 from .core import Context, Controller
@@ -5,14 +5,30 @@ Component base type classes (including enums)
 """
 
 import asyncio
+import collections
 import datetime
 import json
 import queue
+import re
+import struct
 import threading
+import zlib
 
 from enum import Enum
 from datetime import datetime, timedelta
 
+try:
+    import numpy
+except ImportError:
+    numpy = None
+
+BINARY_CONTENT_TYPE = 'application/octet-stream'
+DEFAULT_COMPRESSION_LEVEL = 6
+DEFAULT_COMPRESSION_THRESHOLD = 1024
+DATAGRAM_HEADER = struct.Struct('<QB')  # sequence number (of the first record), key length; followed by the key
+STREAM_PREAMBLE = struct.Struct('<4sB')  # magic, key length; followed by the key
+STREAM_PREAMBLE_MAGIC = b'ODMF'
+
 data_types = {
     'bool':     "?",
     'char':     "c",
@@ -45,6 +61,38 @@ data_sizes = {
     'string':   256
 }
 
+data_dtypes = {
+    'bool':     "?",
+    'char':     "S1",
+    'int8':     "i1",
+    'uint8':    "u1",
+    'int16':    "<i2",
+    'uint16':   "<u2",
+    'int32':    "<i4",
+    'uint32':   "<u4",
+    'int64':    "<i8",
+    'uint64':   "<u8",
+    'float':    "<f4",
+    'double':   "<f8",
+    'string':   "S256"
+}
+
+data_converters = {
+    'bool':     lambda value: value in ('True', 'true', '1'),
+    'char':     str,
+    'int8':     int,
+    'uint8':    int,
+    'int16':    int,
+    'uint16':   int,
+    'int32':    int,
+    'uint32':   int,
+    'int64':    int,
+    'uint64':   int,
+    'float':    float,
+    'double':   float,
+    'string':   str
+}
+
 
 def dataTypesToFormat(dataTypes):
     """ Convert data schema types to format for use in struct packing/unpacking. """
@@ -68,6 +116,63 @@ def dataTypesToSize(dataTypes):
     return size
 
 
+def dataTypesToConverters(dataTypes):
+    """ Convert data schema types to the functions used to convert text fields into typed values. """
+    return [data_converters['string' if t.startswith('string') else t] for t in str(dataTypes).split(',')]
+
+
+def dataTypesToDtype(dataTypes):
+    """ Convert data schema types to a packed NumPy structured dtype, matching the struct packing/unpacking layout. """
+    if numpy is None:
+        raise ImportError("NumPy is required for structured array access to data records.")
+    formats = []
+    for t in str(dataTypes).split(','):
+        if t.startswith('string') & (len(t.split('_')) > 1):
+            formats.append('S' + t.split('_')[1])
+        else:
+            formats.append(data_dtypes[t])
+    return numpy.dtype([(f'f{i}', f) for i, f in enumerate(formats)])
+
+
+def isoDurationToSeconds(duration):
+    """ Convert an ISO 8601 duration (e.g. PT0.5S, as used for refresh periods) or a number of seconds to seconds. """
+    if isinstance(duration, (int, float)):
+        return float(duration)
+    match = re.fullmatch(r'P(?:(\d+(?:\.\d+)?)D)?(?:T(?:(\d+(?:\.\d+)?)H)?(?:(\d+(?:\.\d+)?)M)?(?:(\d+(?:\.\d+)?)S)?)?',
+                         str(duration).strip().upper())
+    if not match:
+        raise ValueError(f"Invalid ISO 8601 duration \"{duration}\".")
+    days, hours, minutes, seconds = (float(value) if value else 0 for value in match.groups())
+    return (((days * 24 + hours) * 60) + minutes) * 60 + seconds
+
+
+def packDatagramHeader(buffer, key, sequence):
+    """ Pack the header of a datagram (sequence number and stream key) into the buffer, returns the header size. """
+    encoded_key = key.encode('utf-8')
+    DATAGRAM_HEADER.pack_into(buffer, 0, sequence, len(encoded_key))
+    buffer[DATAGRAM_HEADER.size:DATAGRAM_HEADER.size + len(encoded_key)] = encoded_key
+    return DATAGRAM_HEADER.size + len(encoded_key)
+
+
+def datagramHeaderSize(key):
+    """ Size of the header of a datagram on the keyed stream. """
+    return DATAGRAM_HEADER.size + len(key.encode('utf-8'))
+
+
+def unpackDatagram(data):
+    """ Unpack a datagram into its stream key, sequence number and a view on the records it holds. """
+    sequence, key_length = DATAGRAM_HEADER.unpack_from(data, 0)
+    offset = DATAGRAM_HEADER.size + key_length
+    view = memoryview(data)
+    return str(view[DATAGRAM_HEADER.size:offset], 'utf-8'), sequence, view[offset:]
+
+
+def packStreamPreamble(key):
+    """ Preamble opening a TCP connection, naming the stream whose records follow. """
+    encoded_key = key.encode('utf-8')
+    return STREAM_PREAMBLE.pack(STREAM_PREAMBLE_MAGIC, len(encoded_key)) + encoded_key
+
+
 def timestamp():
     return datetime.utcnow().strftime('%Y-%m-%dT%H:%M:%S.%f')[:-3] + 'Z'
 
@@ -106,6 +211,9 @@ class Protocol(Enum):
     TCP = 1
     MQTT = 2
     MQTTS = 3
+    SHM = 4
+    UDP = 5
+    FILE = 6
 
     @staticmethod
     def to_string(protocol):
@@ -113,6 +221,194 @@ class Protocol(Enum):
         return protocol.name
 
 
+class Compression:
+    """
+    Optional zlib compression of payloads.\n
+    Each payload is prefixed with a flag byte indicating if the remainder is compressed, as payloads below the size
+    threshold (or not reduced by compression) are sent as is. Streamed (TCP) data is compressed as a whole instead.
+    """
+
+    NONE = 0
+    ZLIB = 1
+
+    def __init__(self, level=DEFAULT_COMPRESSION_LEVEL, threshold=DEFAULT_COMPRESSION_THRESHOLD):
+        self.level = level
+        self.threshold = threshold
+
+    @staticmethod
+    def from_config(value):
+        """ Get compression from a schema/endpoint setting (true, a level or an object with a level and threshold). """
+        if not value:
+            return None
+        if isinstance(value, dict):
+            return Compression(value['level'] if 'level' in value else DEFAULT_COMPRESSION_LEVEL,
+                               value['threshold'] if 'threshold' in value else DEFAULT_COMPRESSION_THRESHOLD)
+        return Compression() if value is True else Compression(int(value))
+
+    def compress(self, payload):
+        """ Compress the payload where at least the size threshold, prefixed with the compression flag. """
+        if isinstance(payload, str):
+            payload = payload.encode('utf-8')
+        if len(payload) >= self.threshold:
+            compressed = zlib.compress(payload, self.level)
+            if len(compressed) < len(payload):
+                return bytes((Compression.ZLIB,)) + compressed
+        return bytes((Compression.NONE,)) + payload
+
+    @staticmethod
+    def decompress(payload):
+        """ Restore a payload prefixed with the compression flag. """
+        if not payload:
+            return payload
+        if payload[0] == Compression.ZLIB:
+            return zlib.decompress(memoryview(payload)[1:])
+        return payload[1:]
+
+    def compressor(self):
+        """ Get a compressor for streamed data. """
+        return zlib.compressobj(self.level)
+
+
+class Overflow(Enum):
+    """ Enum of viable overload policies applied by bounded data queues once at capacity """
+
+    BLOCK = 0
+    DROP_OLDEST = 1
+    DROP_NEWEST = 2
+    SAMPLE = 3
+
+    @staticmethod
+    def to_string(overflow):
+        """ Get string representation of enum name """
+        return ''.join(word.title() for word in overflow.name.split('_'))
+
+    @staticmethod
+    def from_string(value):
+        """ Get enum value from string representation, defaults to blocking where unrecognized """
+        return next((o for o in Overflow if Overflow.to_string(o) == value), Overflow.BLOCK)
+
+
+class Window(Enum):
+    """ Enum of viable boundaries on which inbound records are grouped into windows """
+
+    BLOCK = 0
+    SCAN = 1
+
+    @staticmethod
+    def to_string(window):
+        """ Get string representation of enum name """
+        return window.name.title()
+
+    @staticmethod
+    def from_string(value):
+        """ Get enum value from string representation, defaults to block windows where unrecognized """
+        return next((w for w in Window if Window.to_string(w) == value), Window.BLOCK)
+
+
+class BoundedQueue:
+    """
+    Cross threaded FIFO queue (a drop-in for queue.SimpleQueue) with an optional capacity.\n
+    Once at capacity the overflow policy applies, either blocking the producer, dropping the oldest item, dropping the
+    newest item or sampling 1-in-N of the newest items (each sample displacing the oldest item). A capacity of 0
+    leaves the queue unbounded.
+    """
+
+    def __init__(self, capacity=0, overflow=Overflow.BLOCK, sample_rate=1):
+        self._items = collections.deque()
+        self._lock = threading.Lock()
+        self._not_empty = threading.Condition(self._lock)
+        self._not_full = threading.Condition(self._lock)
+        self._capacity = max(int(capacity), 0)
+        self._overflow = overflow
+        self._sample_rate = max(int(sample_rate), 1)
+        self._overflow_count = 0
+        self._dropped_count = 0
+        self._listeners = []
+
+    @property
+    def capacity(self):
+        """ Maximum number of items held by the queue, 0 where unbounded. """
+        return self._capacity
+
+    @property
+    def overflow(self):
+        """ Policy applied to new items once the queue is at capacity. """
+        return self._overflow
+
+    def put(self, item, block=True, timeout=None):
+        """ Put the item on the queue, applying the overflow policy where at capacity. """
+        with self._lock:
+            if self._capacity and (len(self._items) >= self._capacity):
+                if self._overflow == Overflow.BLOCK:
+                    if not block or not self._not_full.wait_for(lambda: len(self._items) < self._capacity, timeout):
+                        self._dropped_count += 1
+                        return
+                elif self._overflow == Overflow.DROP_NEWEST:
+                    self._dropped_count += 1
+                    return
+                else:
+                    self._overflow_count += 1
+                    self._dropped_count += 1
+                    if (self._overflow == Overflow.SAMPLE) and (self._overflow_count % self._sample_rate):
+                        return
+                    self._items.popleft()
+            self._items.append(item)
+            self._not_empty.notify_all()
+        for listener in self._listeners:
+            listener()
+
+    def put_nowait(self, item):
+        """ Put the item on the queue without blocking. """
+        self.put(item, block=False)
+
+    def get(self, block=True, timeout=None):
+        """ Remove and return the oldest item from the queue. """
+        with self._lock:
+            if not self._items:
+                if not block or not self._not_empty.wait_for(lambda: self._items, timeout):
+                    raise queue.Empty
+            item = self._items.popleft()
+            self._not_full.notify()
+            return item
+
+    def get_nowait(self):
+        """ Remove and return the oldest item from the queue without blocking. """
+        return self.get(block=False)
+
+    def wait(self, timeout=None):
+        """ Block until the queue holds an item or the timeout elapses, returns whether an item is available. """
+        with self._lock:
+            return bool(self._not_empty.wait_for(lambda: self._items, timeout))
+
+    def add_listener(self, listener):
+        """ Register a callable that is invoked (from the producing thread) whenever an item is put on the queue. """
+        self._listeners = self._listeners + [listener]
+
+    def remove_listener(self, listener):
+        """ Unregister a callable previously registered to item arrival. """
+        self._listeners = [l for l in self._listeners if l is not listener]
+
+    def empty(self):
+        """ Indicates if the queue is currently empty. """
+        return not self._items
+
+    def qsize(self):
+        """ Approximate number of items in the queue. """
+        return len(self._items)
+
+    def add_dropped_count(self, count):
+        """ Account for items lost before reaching the queue (such as datagrams missing from a sequence). """
+        with self._lock:
+            self._dropped_count += count
+
+    def take_dropped_count(self):
+        """ Return the count of items dropped since the previous call and reset the count. """
+        with self._lock:
+            dropped_count = self._dropped_count
+            self._dropped_count = 0
+            return dropped_count
+
+
 class Endpoint:
     """ Basic class containing connection details. """
 
@@ -125,7 +421,7 @@ class Endpoint:
 
     @property
     def protocol(self):
-        """ Connection type [MQTT/MQTTS/TCP]. """
+        """ Connection type [MQTT/MQTTS/TCP/SHM/UDP/FILE]. """
         return self._protocol
 
     @protocol.setter
@@ -133,11 +429,11 @@ class Endpoint:
         if isinstance(value, Protocol):
             self._protocol = value
         else:
-            self._protocol = Protocol.MQTT if value == 'MQTT' else Protocol.MQTTS if value == 'MQTTS' else Protocol.TCP if value == 'TCP' else Protocol.UNKNOWN
+            self._protocol = Protocol[value] if value in Protocol.__members__ else Protocol.UNKNOWN
 
     @property
     def ip_address(self):
-        """ IP address of the connection. """
+        """ IP address of the connection (the recordings directory, where replaying files). """
         return self._ip_address
 
     @ip_address.setter
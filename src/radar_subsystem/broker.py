@@ -0,0 +1,164 @@
+#!/usr/bin/python3.8
+# -*- coding: utf-8 -*-
+"""
+Shared broker connection classes and functionality, pooled per process
+"""
+
+import itertools
+import ssl
+import threading
+
+import paho.mqtt.client as mqtt
+
+from .base import Protocol, Style
+
+_connections = {}
+_connections_lock = threading.Lock()
+_connection_sequence = itertools.count()  # never reused, as the broker drops a client on a duplicate client id
+
+
+class Listener:
+    """ Registration of a sub-system component's callbacks on a shared broker connection. """
+
+    def __init__(self, userdata, on_connect=None, on_disconnect=None, on_message=None, on_publish=None):
+        self.userdata = userdata
+        self.on_connect = on_connect
+        self.on_disconnect = on_disconnect
+        self.on_message = on_message
+        self.on_publish = on_publish
+
+
+class BrokerConnection:
+    """
+    Single MQTT client (and network thread) to a broker, multiplexed over by the controller and the input and output
+    channels of the sub-system.\n
+    Components register listeners for connection events and subscribe topics to their own message callbacks, with
+    the subscriptions renewed on reconnection. Messages on topics without a subscribed callback are passed to the
+    listeners' on_message callback (the controller).
+    """
+
+    def __init__(self, endpoint, client_id):
+        self._endpoint = endpoint
+        self._listeners = []
+        self._subscriptions = {}
+        self._reference_count = 0
+        self.is_connected = False
+        self._client = mqtt.Client(client_id=client_id, clean_session=True,
+                                   userdata=self, protocol=mqtt.MQTTv311, transport='tcp')
+        if endpoint.protocol == Protocol.MQTTS:
+            # Enables TLS1.2 with externally provided keys/certificates
+            self._client.tls_set(None, None, None, cert_reqs=ssl.CERT_NONE,
+                                 tls_version=ssl.PROTOCOL_TLSv1_2, ciphers=None)
+            # disables peer verification
+            self._client.tls_insecure_set(True)
+        self._client.on_connect = self._on_connect
+        self._client.on_disconnect = self._on_disconnect
+        self._client.on_message = self._on_message
+        self._client.on_publish = self._on_publish
+
+    @property
+    def client(self):
+        """ Underlying MQTT client, for publishing. """
+        return self._client
+
+    @property
+    def endpoint(self):
+        """ Broker connection details. """
+        return self._endpoint
+
+    def retain(self):
+        """ Register an additional holder of the connection. """
+        self._reference_count += 1
+
+    def release(self):
+        """ Unregister a holder of the connection, returns true where the connection is no longer held. """
+        self._reference_count -= 1
+        return self._reference_count <= 0
+
+    def connect(self):
+        """ Initialize the connection to the broker and start the network thread. """
+        print(f"{Style.INFO}MQTT client connecting on {self._endpoint.ip_address}:{self._endpoint.port}{' with TLS support' if self._endpoint.protocol == Protocol.MQTTS else ''}...{Style.EOS}")
+        self._client.connect_async(self._endpoint.ip_address, self._endpoint.port, 60)
+        self._client.loop_start()
+
+    def disconnect(self):
+        """ Terminate the connection to the broker and stop the network thread. """
+        print(f"{Style.INFO}MQTT client disconnecting...{Style.EOS}")
+        self._client.disconnect()
+        self._client.loop_stop()
+
+    def add_listener(self, listener):
+        """ Register a listener to connection events, notifying it at once where already connected. """
+        self._listeners = self._listeners + [listener]
+        if self.is_connected and listener.on_connect:
+            listener.on_connect(self._client, listener.userdata, None, 0)
+
+    def remove_listener(self, listener):
+        """ Unregister a listener from connection events. """
+        self._listeners = [l for l in self._listeners if l is not listener]
+
+    def subscribe(self, topic, callback, userdata):
+        """ Subscribe to the topic, with messages passed to the callback along with the given userdata. """
+        # Replaced rather than modified, as the subscriptions are iterated over by the network thread on reconnection
+        self._subscriptions = {**self._subscriptions, topic: (callback, userdata)}
+        self._client.message_callback_add(topic, lambda client, _, msg: callback(client, userdata, msg))
+        if self.is_connected:
+            self._client.subscribe(topic)
+
+    def unsubscribe(self, topic):
+        """ Unsubscribe from the topic and remove its callback. """
+        if topic in self._subscriptions:
+            self._subscriptions = {t: s for t, s in self._subscriptions.items() if t != topic}
+            self._client.message_callback_remove(topic)
+            if self.is_connected:
+                self._client.unsubscribe(topic)
+
+    def _on_connect(self, client, _, flags, result):
+        self.is_connected = True
+        for topic in self._subscriptions:
+            client.subscribe(topic)
+        for listener in self._listeners:
+            if listener.on_connect:
+                listener.on_connect(client, listener.userdata, flags, result)
+
+    def _on_disconnect(self, client, _, result):
+        self.is_connected = False
+        for listener in self._listeners:
+            if listener.on_disconnect:
+                listener.on_disconnect(client, listener.userdata, result)
+
+    def _on_message(self, client, _, msg):
+        for listener in self._listeners:
+            if listener.on_message:
+                listener.on_message(client, listener.userdata, msg)
+
+    def _on_publish(self, client, _, mid):
+        for listener in self._listeners:
+            if listener.on_publish:
+                listener.on_publish(client, listener.userdata, mid)
+
+
+def acquire_connection(endpoint, local_uid):
+    """ Get the shared connection to the endpoint's broker, connecting where not yet held by the process. """
+    key = (endpoint.protocol, endpoint.ip_address, endpoint.port)
+    with _connections_lock:
+        connection = _connections.get(key)
+        if connection is None:
+            sequence = next(_connection_sequence)
+            client_id = f"{local_uid}_broker{sequence}" if sequence else f"{local_uid}_broker"
+            connection = BrokerConnection(endpoint, client_id)
+            _connections[key] = connection
+            connection.connect()
+        connection.retain()
+    return connection
+
+
+def release_connection(connection):
+    """ Release a shared connection, disconnecting from the broker once no longer held by any component. """
+    with _connections_lock:
+        if not connection.release():
+            return
+        key = (connection.endpoint.protocol, connection.endpoint.ip_address, connection.endpoint.port)
+        if _connections.get(key) is connection:
+            del _connections[key]
+    connection.disconnect()
@@ -5,17 +5,32 @@ Input channel component type classes and functionality
 """
 
 import asyncio
+import contextlib
 import csv
+import ipaddress
+import mmap
+import operator
+import os
 import queue
-import ssl
+import socket
 import struct
+import threading
+import zlib
 
-import paho.mqtt.client as mqtt
-
-from .. import base
+from .. import base, broker
+from . import record_ring
 
 READ_INTERVAL = 0.10
 CANCELLATION_CHECK_INTERVAL = 0.1
+CONNECTION_RETRY_INTERVAL = 2
+SHM_POLL_INTERVAL = 0.005
+CALLBACK_PUT_TIMEOUT = 0.05  # longest hold of the MQTT network thread on a full queue under the Block policy
+UDP_RECEIVE_BUFFER_SIZE = 2**22
+TCP_SCRATCH_BUFFER_SIZE = 2**16
+RECORDING_HEADER_SIZE = 4096
+RECORDING_TICK_INTERVAL = 0.25  # interval of the recorder's sequence counter, stored with each record
+REPLAY_BLOCK_RECORDS = 4096
+AZIMUTH_WRAP_THRESHOLD = 180  # drop in azimuth (degrees) between consecutive records taken as the start of a scan
 RECHECK_DATA_IN_QUEUE_INTERVAL = 0.05
 FORCED_QUEUE_CLEANUP_INTERVAL = 0.5
 
@@ -23,10 +38,7 @@ FORCED_QUEUE_CLEANUP_INTERVAL = 0.5
 def on_connect(client, channel, flags, result):
     """ The callback for CONNACK response from MQTT input server, where applicable. """
     print(f"{base.Style.OK}MQTT subscriber connected{base.Style.EOS}")
-    for topic in channel.endpoint.topics:
-        client.subscribe(topic)
     channel.endpoint.is_active = True
-    client.is_connected = True
 
 
 def on_disconnect(client, channel, result):
@@ -36,54 +48,467 @@ def on_disconnect(client, channel, result):
     else:
         print(
             f"{base.Style.ERROR}MQTT subscriber unexpectedly terminated{base.Style.EOS}")
-    client.user_data_set("")
     channel.endpoint.is_active = False
-    client.is_connected = False
 
 
 def on_message(_, channel, msg):
-    """ The callback for PUBLISH message from the server, where applicable. """
-    lines = msg.payload.decode('utf-8').splitlines()
-    channel.activity_queue.put(len(lines))
-    for row in csv.reader(lines):
-        channel.queue.put(row)
+    """
+    The callback for PUBLISH message from the server, where applicable, parsing is deferred to the consumer.\n
+    The network thread is shared by every subscriber of the process, so a full queue under the Block policy holds it
+    for a short while only, with the payload dropped (and counted as such) where no room is made in time.
+    """
+    stream = channel.stream_for_topic(msg.topic)
+    if stream:
+        payload = base.Compression.decompress(msg.payload) if stream.compression else msg.payload
+        if stream.is_binary:
+            channel.activity_queue.put(len(payload) // max(stream.struct_size, 1))
+        else:
+            channel.activity_queue.put(payload.count(b'\n'))
+        stream.queue.put(payload, timeout=CALLBACK_PUT_TIMEOUT)
 
 
-class CustomProtocol(asyncio.Protocol):
-    """ Class containing the relevant handlers for async TCP data sink. """
+class CustomProtocol(asyncio.BufferedProtocol):
+    """
+    Class containing the relevant handlers for async TCP data sink.\n
+    Each connection opens with a preamble naming the stream its records belong to, with connections lacking one taken
+    as carrying the primary stream. Incoming bytes are then received directly into the record ring of the stream
+    (without intermediate allocations), with only whole records made available to the consumer. Reading is paused while
+    the ring is full and resumed once the consumer releases records, leaving TCP flow control to push back on the sender.
+    Compressed streams are received into a scratch buffer instead, with the decompressed records copied into the ring.
+    """
 
-    def __init__(self, endpoint, queue, activity_queue):
+    def __init__(self, endpoint, channel, connections):
         self._endpoint = endpoint
-        self._queue = queue
-        self._activity_queue = activity_queue
+        self._channel = channel
+        self._connections = connections
+        self._stream = None
+        self._ring = None
+        self._preamble = bytearray(base.STREAM_PREAMBLE.size + 255)
+        self._preamble_size = base.STREAM_PREAMBLE.size
+        self._preamble_received = 0
+        self._decompressor = None
+        self._scratch = None
+        self._backlog = bytearray()
+        self._is_paused = False
+        self._loop = None
+        self.transport = None
 
     def connection_made(self, transport):
-        peer = transport.get_extra_info('peername')
-        print(
-            f"{base.Style.OK}TCP data sink connection opened on {peer[0]}:{peer[1]}{base.Style.EOS}")
-        self._endpoint.is_active = True
         self.transport = transport
+        self._loop = asyncio.get_event_loop()
 
     def connection_lost(self, transport):
-        print(f"{base.Style.WARNING}TCP data sink disconnected{base.Style.EOS}")
+        if not self._stream or (self._connections.get(self._stream.key) is not self):
+            return
+        print(f"{base.Style.WARNING}TCP data sink of the {self._stream.key} stream disconnected{base.Style.EOS}")
+        del self._connections[self._stream.key]
+        self._stream.release_listener = None
+        self._endpoint.is_active = bool(self._connections)
+        self._ring.truncate()
+
+    def get_buffer(self, sizehint):
+        if not self._stream:
+            return memoryview(self._preamble)[self._preamble_received:self._preamble_size]
+        return self._scratch if (self._decompressor or self._backlog) else self._ring.writable()
+
+    def buffer_updated(self, nbytes):
+        if not self._stream:
+            self._preamble_received += nbytes
+            self.read_preamble()
+            return
+        record_size = self._ring.record_size
+        if self._decompressor:
+            self._backlog += self._decompressor.decompress(memoryview(self._scratch)[:nbytes])
+            completed = self.write_backlog()
+        elif self._backlog:
+            self._backlog += memoryview(self._scratch)[:nbytes]
+            completed = self.write_backlog()
+        else:
+            write_cursor = self._ring.write_cursor
+            self._ring.commit(nbytes)
+            completed = ((write_cursor + nbytes) // record_size) - (write_cursor // record_size)
+        if completed:
+            self._channel.activity_queue.put(completed)
+            self._channel.notify_arrival()
+        if not self._ring.free() or self._backlog:
+            self._is_paused = True
+            self.transport.pause_reading()
+            # Records released by the consumer before the pause was flagged would not trigger a resume
+            self._resume_reading()
+
+    def read_preamble(self):
+        """ Interpret the preamble received so far, attaching the connection to its stream once complete. """
+        if self._preamble_received < base.STREAM_PREAMBLE.size:
+            return
+        magic, key_length = base.STREAM_PREAMBLE.unpack_from(self._preamble, 0)
+        if magic != base.STREAM_PREAMBLE_MAGIC:
+            # Senders predating the preamble, with the bytes read so far already being record data
+            self.attach(self._channel.primary_stream, bytes(self._preamble[:self._preamble_received]))
+            return
+        self._preamble_size = base.STREAM_PREAMBLE.size + key_length
+        if self._preamble_received < self._preamble_size:
+            return
+        key = str(self._preamble[base.STREAM_PREAMBLE.size:self._preamble_size], 'utf-8', 'replace')
+        self.attach(self._channel.streams.get(key))
+
+    def attach(self, stream, data=b''):
+        """ Attach the connection to the stream it carries, with any record data received ahead of it. """
+        peer = self.transport.get_extra_info('peername')
+        if not stream or (stream.ring is None):
+            print(f"{base.Style.WARNING}TCP data sink has no such inbound stream, refusing {peer[0]}:{peer[1]}{base.Style.EOS}")
+            self.transport.close()
+            return
+        if stream.key in self._connections:
+            # The ring holds a single producer, so concurrent senders would interleave partial records
+            print(f"{base.Style.WARNING}TCP data sink of the {stream.key} stream already connected, refusing {peer[0]}:{peer[1]}{base.Style.EOS}")
+            self.transport.close()
+            return
+        print(
+            f"{base.Style.OK}TCP data sink connection of the {stream.key} stream opened on {peer[0]}:{peer[1]}{base.Style.EOS}")
+        self._stream = stream
+        self._ring = stream.ring
+        self._decompressor = zlib.decompressobj() if stream.compression else None
+        self._scratch = bytearray(TCP_SCRATCH_BUFFER_SIZE)
+        self._connections[stream.key] = self
+        stream.release_listener = self.resume
+        self._endpoint.is_active = True
+        if data:
+            self._backlog += self._decompressor.decompress(data) if self._decompressor else data
+            completed = self.write_backlog()
+            if completed:
+                self._channel.activity_queue.put(completed)
+                self._channel.notify_arrival()
+
+    def write_backlog(self):
+        """ Copy as much of the backlog as fits into the ring, returns the number of records completed. """
+        record_size = self._ring.record_size
+        write_cursor = self._ring.write_cursor
+        written = 0
+        while written < len(self._backlog):
+            region = self._ring.writable()
+            count = min(len(region), len(self._backlog) - written)
+            if not count:
+                break
+            region[:count] = self._backlog[written:written + count]
+            self._ring.commit(count)
+            written += count
+        del self._backlog[:written]
+        return ((write_cursor + written) // record_size) - (write_cursor // record_size)
+
+    def resume(self):
+        """ Resume reading once the consumer has released records (thread-safe). """
+        if self._is_paused:
+            self._loop.call_soon_threadsafe(self._resume_reading)
+
+    def _resume_reading(self):
+        if self._is_paused and self._backlog:
+            completed = self.write_backlog()
+            if completed:
+                self._channel.activity_queue.put(completed)
+                self._channel.notify_arrival()
+        if self._is_paused and self._ring.free() and not self._backlog and not self.transport.is_closing():
+            self._is_paused = False
+            self.transport.resume_reading()
+
+
+class MulticastProtocol(asyncio.DatagramProtocol):
+    """
+    Class containing the relevant handlers for the async UDP (multicast) data sink.\n
+    Each datagram holds whole records of a single stream, headed by the stream key and the sequence number of its
+    first record, so that records missing from the sequence are accounted for as dropped.
+    """
+
+    def __init__(self, endpoint, channel):
+        self._endpoint = endpoint
+        self._channel = channel
+        self._sequences = {}
+
+    def connection_made(self, transport):
+        print(f"{base.Style.OK}UDP data sink listening on {self._endpoint.ip_address}:{self._endpoint.port}{base.Style.EOS}")
+        self._endpoint.is_active = True
+
+    def connection_lost(self, exc):
+        print(f"{base.Style.WARNING}UDP data sink closed{base.Style.EOS}")
         self._endpoint.is_active = False
 
-    def data_received(self, data):
-        self._activity_queue.put(1)
-        self._queue.put(data)
+    def datagram_received(self, data, addr):
+        try:
+            key, sequence, records = base.unpackDatagram(data)
+        except (struct.error, UnicodeDecodeError):
+            return
+        stream = self._channel.streams.get(key)
+        if not stream or not stream.struct_size:
+            return
+        count = len(records) // stream.struct_size
+        expected = self._sequences.get(key)
+        if expected is not None and sequence > expected:
+            stream.queue.add_dropped_count(sequence - expected)
+        # A sequence number behind the expected one is taken as a restart of the sender, rather than reordering
+        self._sequences[key] = sequence + count
+        self._channel.activity_queue.put(count)
+        # Never blocking the event loop, so that datagrams arriving at a full queue are dropped (and counted) instead
+        stream.queue.put(records, block=False)
+
+
+class InputStream:
+    """ Class defining a single inbound data stream (per topic), with its own queue and record layout. """
+
+    def __init__(self, key, topic, layout, queue_config, listener, content_type=None, compression=None):
+        self._key = key
+        self._topic = topic
+        self._is_binary = content_type == base.BINARY_CONTENT_TYPE
+        self._compression = compression
+        self._queue = base.BoundedQueue(
+            queue_config['capacity'] if 'capacity' in queue_config else 0,
+            base.Overflow.from_string(queue_config['overflow']) if 'overflow' in queue_config else base.Overflow.BLOCK,
+            queue_config['sampleRate'] if 'sampleRate' in queue_config else 1)
+        self._queue.add_listener(listener)
+        self._ring = None
+        self._release_listener = None
+        self._columns = None
+        self.layout = layout
+
+    @property
+    def key(self):
+        """ Key name of the stream. """
+        return self._key
+
+    @property
+    def topic(self):
+        """ Topic on the source sub-system from which the stream is received. """
+        return self._topic
+
+    @property
+    def queue(self):
+        """ Cross threaded queue for inbound data on the stream. """
+        return self._queue
+
+    @property
+    def ring(self):
+        """ Ring buffer holding the inbound records in place of the queue (TCP/SHM input), where applicable. """
+        return self._ring
+
+    @ring.setter
+    def ring(self, value):
+        self._ring = value
+
+    @property
+    def release_listener(self):
+        """ Callback invoked once records are released from the ring, where the producer awaits free space. """
+        return self._release_listener
+
+    @release_listener.setter
+    def release_listener(self, value):
+        self._release_listener = value
+
+    @property
+    def is_binary(self):
+        """ Indicates if payloads hold struct packed records (as with raw TCP), rather than CSV text. """
+        return self._is_binary
+
+    @property
+    def compression(self):
+        """ [OPTIONAL] Compression applied to the payloads (or the TCP stream) by the source, None where uncompressed. """
+        return self._compression
+
+    @property
+    def layout(self):
+        """ Data schema types of an individual data packet, from which the struct format and size are derived. """
+        return self._layout
+
+    @layout.setter
+    def layout(self, value):
+        self._layout = value
+        self._struct_format = base.dataTypesToFormat(value) if value else None
+        self._struct_size = base.dataTypesToSize(value) if value else 0
+        self.project()
+
+    @property
+    def columns(self):
+        """ [OPTIONAL] Indices of the fields read out of each record (in layout order), None where reading all fields. """
+        return self._columns
+
+    @columns.setter
+    def columns(self, value):
+        self._columns = tuple(sorted(set(value))) if value else None
+        self.project()
+
+    def project(self):
+        """
+        Derive the decoders of the selected columns, with the remaining fields skipped as struct pad bytes, dropped
+        from the parsed CSV rows or left out of the NumPy dtype (without being converted).
+        """
+        self._dtype = None
+        self._unpack_format = self._struct_format
+        self._row_getter = None
+        field_types = self._layout.split(',') if self._layout else []
+        self._converters = base.dataTypesToConverters(self._layout) if self._layout else []
+        if self._columns is None:
+            return
+        columns = [column for column in self._columns if not field_types or (column < len(field_types))]
+        if not columns:
+            return
+        self._row_getter = operator.itemgetter(*columns) if len(columns) > 1 else lambda row: (row[columns[0]],)
+        if field_types:
+            self._unpack_format = '<' + ''.join(
+                base.dataTypesToFormat(t)[1:] if i in columns else f"{base.dataTypesToSize(t)}x"
+                for i, t in enumerate(field_types))
+            self._converters = [self._converters[column] for column in columns]
+
+    @property
+    def struct_format(self):
+        """ Struct format where pack/unpack used. """
+        return self._struct_format
+
+    @property
+    def struct_size(self):
+        """ Struct size of individual data packet. """
+        return self._struct_size
+
+    @property
+    def dtype(self):
+        """
+        NumPy structured dtype of an individual data packet, as derived from the layout (requires NumPy), holding only
+        the selected columns (at their offsets in the record) where projected.
+        """
+        if self._dtype is None and self._layout:
+            self._dtype = base.dataTypesToDtype(self._layout)
+            if self._columns is not None:
+                names = [self._dtype.names[column] for column in self._columns if column < len(self._dtype.names)]
+                self._dtype = base.numpy.dtype({
+                    'names': names,
+                    'formats': [self._dtype.fields[name][0] for name in names],
+                    'offsets': [self._dtype.fields[name][1] for name in names],
+                    'itemsize': self._dtype.itemsize})
+        return self._dtype
+
+    def empty(self):
+        """ Indicates if no inbound data is queued (or held in the ring) on the stream. """
+        return self._queue.empty() and ((self._ring is None) or self._ring.empty())
+
+    def unpack(self, protocol):
+        """ Read out queued up data according to the protocol in use (to list if MQTT and struct if TCP/SHM). """
+        result = []
+        if self._ring is not None:
+            if self._unpack_format:
+                views = self._ring.readable()
+                for view in views:
+                    result.extend(struct.iter_unpack(self._unpack_format, view))
+                self.release(sum(map(len, views)))
+        elif not self._queue.empty():
+            if self.holds_records(protocol):
+                if self._unpack_format:
+                    result = struct.iter_unpack(
+                        self._unpack_format, self.read_records())
+            elif (protocol == base.Protocol.MQTT) or (protocol == base.Protocol.MQTTS):
+                lines = []
+                for payload in self.read_payloads():
+                    lines.extend(payload.decode('utf-8').splitlines())
+                result = list(map(self._row_getter, csv.reader(lines))) if self._row_getter else list(csv.reader(lines))
+        return result
+
+    def holds_records(self, protocol):
+        """ Indicates if queued payloads are struct packed records under the protocol in use, rather than CSV text. """
+        return self._is_binary or protocol in (base.Protocol.TCP, base.Protocol.SHM, base.Protocol.UDP, base.Protocol.FILE)
+
+    @contextlib.contextmanager
+    def views(self, protocol):
+        """
+        Provide NumPy arrays viewing the inbound records in place (without copying) where held in a ring, with the
+        records released back to the producer on exit, so the arrays must not be used beyond the context.
+        Queued data is read out to a single array instead.
+        """
+        if self._ring is None:
+            yield [self.unpack_array(protocol)]
+            return
+        views = self._ring.readable()
+        try:
+            yield [base.numpy.frombuffer(view, self.dtype) for view in views]
+        finally:
+            self.release(sum(map(len, views)))
+
+    def unpack_array(self, protocol):
+        """ Read out queued up data as a single NumPy structured array, typed according to the layout. """
+        if not self.dtype:
+            raise ValueError(f"Layout of the {self._key} stream undefined, cannot unpack to a structured array.")
+        if self._ring is not None:
+            with self.views(protocol) as arrays:
+                return base.numpy.concatenate(arrays) if arrays else base.numpy.empty(0, self.dtype)
+        if self._queue.empty():
+            return base.numpy.empty(0, self.dtype)
+        if self.holds_records(protocol):
+            return base.numpy.frombuffer(self.read_records(), self.dtype)
+        rows = self.unpack(protocol)
+        result = base.numpy.empty(len(rows), self.dtype)
+        # Numeric text is parsed by NumPy in bulk, with boolean text the only field needing explicit conversion
+        for name, converter, column in zip(self.dtype.names, self._converters, zip(*rows)):
+            result[name] = column if self.dtype[name].kind != 'b' else list(map(converter, column))
+        return result
+
+    def unpack_columns(self, protocol):
+        """ Read out queued up data as a list of typed columns (one list per field), converted according to the layout. """
+        rows = self.unpack(protocol)
+        if self.holds_records(protocol) or not self._layout:
+            return [list(column) for column in zip(*rows)]
+        return [list(map(converter, column))
+                for converter, column in zip(self._converters, zip(*rows))]
+
+    def read_payloads(self):
+        """ Drain all of the items currently in the queue, as received (raw payloads/chunks). """
+        items = []
+        try:
+            for _ in range(self._queue.qsize()):
+                items.append(self._queue.get_nowait())
+        except queue.Empty:
+            pass
+        return items
+
+    def read_records(self):
+        """
+        Drain all of the record aligned chunks (from the TCP data sink or binary payloads) currently queued, joined
+        into a single buffer (the only copy made of the received bytes).
+        """
+        chunks = self.read_payloads()
+        if len(chunks) == 1:
+            return chunks[0]
+        return b''.join(chunks)
+
+    def release(self, nbytes):
+        """ Return bytes read from the ring to the producer, notifying the release listener. """
+        self._ring.release(nbytes)
+        if self._release_listener:
+            self._release_listener()
+
+    def purge(self):
+        """ Discard all of the items currently in the queue (or held in the ring). """
+        try:
+            while True:
+                self._queue.get_nowait()
+        except queue.Empty:
+            pass
+        if self._ring is not None:
+            self.release(sum(map(len, self._ring.readable())))
 
 
 class InputChannel(base.Component):
-    """ Class defining the input channel component, not used with the Control and DataFeeder sub-system types. """
+    """
+    Class defining the input channel component, not used with the Control and DataFeeder sub-system types.\n
+    Inbound data may be received from several topics (streams), each with its own queue and layout, which are read
+    out either merged (where the layouts agree) or keyed by stream.
+    """
 
-    def __init__(self, local_uid):
+    def __init__(self, local_uid, config=None):
         super().__init__()
         self._local_uid = local_uid
         self._endpoint = None
-        self._stream_key = None
-        self._queue = queue.SimpleQueue()
-        self._struct_format = None
-        self._struct_size = 0
+        self._queue_config = config if config else {}
+        self._replay_speed = self._queue_config['replaySpeed'] if 'replaySpeed' in self._queue_config else 1
+        self._streams = {}
+        self._topic_streams = {}
+        self._columns = {}
+        self._idle_queue = base.BoundedQueue()
+        self._arrival = threading.Event()
+        self._listeners = []
 
     @property
     def endpoint(self):
@@ -95,67 +520,387 @@ class InputChannel(base.Component):
         self._endpoint = value
 
     @property
-    def stream_key(self):
-        """ Key name of the active stream. """
-        return self._stream_key
+    def replay_speed(self):
+        """ Rate of file replay relative to the recording rate, 0 replaying as fast as the records are consumed. """
+        return self._replay_speed
 
-    @stream_key.setter
-    def stream_key(self, value):
-        self._stream_key = value
+    @replay_speed.setter
+    def replay_speed(self, value):
+        self._replay_speed = max(float(value), 0)
 
     @property
-    def struct_size(self):
-        """ Struct size of individual data packet. """
-        return self._struct_size
+    def streams(self):
+        """ Dictionary of the inbound streams, by key. """
+        return self._streams
+
+    @property
+    def primary_stream(self):
+        """ First of the configured inbound streams, None where none are configured. """
+        return next(iter(self._streams.values()), None)
+
+    @property
+    def stream_key(self):
+        """ Key name of the active (primary) stream. """
+        return self.primary_stream.key if self.primary_stream else None
 
-    @struct_size.setter
-    def struct_size(self, value):
-        self._struct_size = value
+    @property
+    def struct_size(self):
+        """ Struct size of individual data packet, on the primary stream. """
+        return self.primary_stream.struct_size if self.primary_stream else 0
 
     @property
     def struct_format(self):
-        """ Struct format where pack/unpack used. """
-        return self._struct_format
+        """ Struct format where pack/unpack used, on the primary stream. """
+        return self.primary_stream.struct_format if self.primary_stream else None
+
+    @property
+    def layout(self):
+        """ Data schema types of an individual data packet, on the primary stream. """
+        return self.primary_stream.layout if self.primary_stream else None
 
-    @struct_format.setter
-    def struct_format(self, value):
-        self._struct_format = value
+    @property
+    def dtype(self):
+        """ NumPy structured dtype of an individual data packet, on the primary stream (requires NumPy). """
+        return self.primary_stream.dtype if self.primary_stream else None
 
     @property
     def queue(self):
-        """ Cross threaded queue for inbound data. """
-        return self._queue
+        """ Cross threaded queue for inbound data, on the primary stream. """
+        return self.primary_stream.queue if self.primary_stream else self._idle_queue
 
     @property
     def local_uid(self):
         """ UID of the sub-subsystem. """
         return self._local_uid
 
-    def unpack(self):
+    def add_stream(self, key, topic, layout=None, content_type=None, compression=None):
+        """ Add an inbound stream, received on the given topic with records of the given layout and payload type. """
+        stream = InputStream(key, topic, layout, self._queue_config, self.notify_arrival, content_type, compression)
+        stream.columns = self.selected_columns(key)
+        self._streams = {**self._streams, key: stream}
+        self._topic_streams = {**self._topic_streams, topic: stream}
+        return stream
+
+    def select_columns(self, columns, key=None):
+        """
+        Declare the columns (field indices of the layout) read out of the keyed stream, or of all streams where no key
+        is given, with the remaining fields skipped when decoding. None restores reading all fields.\n
+        The selection persists across reconfiguration of the streams.
+        """
+        self._columns = {**self._columns, key: columns}
+        for stream in self._streams.values():
+            stream.columns = self.selected_columns(stream.key)
+
+    def selected_columns(self, key):
+        """ Columns read out of the keyed stream, None where reading all fields. """
+        return self._columns[key] if key in self._columns else self._columns.get(None)
+
+    def clear_streams(self):
+        """ Remove all inbound streams, discarding any data still queued on them. """
+        self._streams = {}
+        self._topic_streams = {}
+
+    def stream_for_topic(self, topic):
+        """ Get the inbound stream received on the given topic, None where not configured. """
+        return self._topic_streams.get(topic)
+
+    def empty(self):
+        """ Indicates if no inbound data is queued on any of the streams. """
+        return all(stream.empty() for stream in self._streams.values())
+
+    def take_dropped_count(self):
+        """ Count of inbound items dropped by the queues' overflow policy since the previous call. """
+        return sum(stream.queue.take_dropped_count() for stream in self._streams.values())
+
+    def select_streams(self, key=None, is_uniform=False):
+        """ Get the inbound stream by key, or all streams where no key given (verifying a common layout if required). """
+        if key is not None:
+            return [self._streams[key]] if key in self._streams else []
+        streams = list(self._streams.values())
+        if is_uniform and len({(stream.layout, stream.columns) for stream in streams}) > 1:
+            raise ValueError("Inbound streams differ in layout, read out by key instead.")
+        return streams
+
+    def unpack(self, key=None):
         """
         Read out queued up data according to the protocol in use (to list if MQTT and struct if TCP).
+        Records are read from the keyed stream or, where no key is given, merged from all streams.
         NOTE: Probable bottleneck due to making data uniform (independent of protocol), consider
         improvements, or use an alternative reader, if this turns out to be an issue.
         """
+        if not self._endpoint:
+            return []
+        streams = self.select_streams(key)
+        if len(streams) == 1:
+            return streams[0].unpack(self._endpoint.protocol)
         result = []
-        if not self.queue.empty():
-            if (self._endpoint.protocol == base.Protocol.MQTT) or (self._endpoint.protocol == base.Protocol.MQTTS):
-                unpack_range = range(0, self.queue.qsize() - 1)
-                for _ in unpack_range:
-                    result.append(self.queue.get())
-                    # self.queue.task_done()
-            elif self._endpoint.protocol == base.Protocol.TCP and self.struct_format:
-                result = struct.iter_unpack(
-                    self.struct_format, self.queue.get())
-                # self.queue.task_done()
+        for stream in streams:
+            result.extend(stream.unpack(self._endpoint.protocol))
+        return result
+
+    def unpack_keyed(self):
+        """ Read out queued up data as a dictionary of record lists, by stream key (non-empty streams only). """
+        result = {}
+        if self._endpoint:
+            for key, stream in self._streams.items():
+                if not stream.empty():
+                    result[key] = list(stream.unpack(self._endpoint.protocol))
+        return result
+
+    def unpack_array(self, key=None):
+        """
+        Read out queued up data as a single NumPy structured array, typed according to the layout (requires NumPy).
+        Where received over TCP the array is a direct view on the joined record buffer, avoiding per-field conversion.
+        Without a key, the streams are merged, which requires a common layout.
+        """
+        streams = self.select_streams(key, is_uniform=True)
+        if not streams or not self._endpoint:
+            raise ValueError("Input channel layout undefined, cannot unpack to a structured array.")
+        if len(streams) == 1:
+            return streams[0].unpack_array(self._endpoint.protocol)
+        return base.numpy.concatenate([stream.unpack_array(self._endpoint.protocol) for stream in streams])
+
+    def unpack_arrays(self):
+        """ Read out queued up data as a dictionary of NumPy structured arrays, by stream key (non-empty only). """
+        result = {}
+        if self._endpoint:
+            for key, stream in self._streams.items():
+                if not stream.empty():
+                    result[key] = stream.unpack_array(self._endpoint.protocol)
         return result
 
+    def unpack_columns(self, key=None):
+        """
+        Read out queued up data as a list of typed columns (one list per field), converted according to the layout.
+        Where no layout is defined the columns are returned as read, i.e. as text for MQTT input. Without a key, the
+        streams are merged, which requires a common layout.
+        """
+        streams = self.select_streams(key, is_uniform=True)
+        if not streams or not self._endpoint:
+            return []
+        columns = []
+        for stream in streams:
+            stream_columns = stream.unpack_columns(self._endpoint.protocol)
+            if not columns:
+                columns = stream_columns
+            else:
+                for column, stream_column in zip(columns, stream_columns):
+                    column.extend(stream_column)
+        return columns
+
+    @contextlib.contextmanager
+    def record_views(self, key=None):
+        """
+        Provide NumPy arrays viewing the inbound records of the keyed (or primary) stream in place, without copying,
+        where held in a ring (TCP/SHM input). The records are released on exit, so the arrays must not be used beyond the
+        context.
+        """
+        streams = self.select_streams(key) if key is not None else [self.primary_stream] if self.primary_stream else []
+        if not streams or not self._endpoint:
+            raise ValueError("Input channel layout undefined, cannot view records.")
+        with streams[0].views(self._endpoint.protocol) as arrays:
+            yield arrays
+
+    async def batches(self, max_items=0, max_latency=READ_INTERVAL, keyed=False):
+        """
+        Asynchronously iterate over inbound data, yielding lists of records (as per unpack) on data arrival.\n
+        After the first arrival, records are gathered for up to max_latency seconds or until max_items records
+        are held (0 being unlimited), with any records in excess of max_items carried over to the next batch.
+        Where keyed, each batch is a dictionary of record lists by stream key and is handed over whole.
+        """
+        arrival = self.register_arrival()
+        loop = asyncio.get_running_loop()
+        pending = {} if keyed else []
+        try:
+            while not self._is_shutting_down:
+                if not pending and not await self.wait_async(arrival, CANCELLATION_CHECK_INTERVAL):
+                    continue
+                self.gather(pending, keyed)
+                deadline = loop.time() + max_latency
+                while (not max_items or (self.count(pending, keyed) < max_items)) and (loop.time() < deadline):
+                    if not await self.wait_async(arrival, deadline - loop.time()):
+                        break
+                    self.gather(pending, keyed)
+                if keyed:
+                    batch, pending = pending, {}
+                elif max_items:
+                    batch, pending = pending[:max_items], pending[max_items:]
+                else:
+                    batch, pending = pending, []
+                if batch:
+                    yield batch
+        finally:
+            self.unregister_arrival(arrival)
+
+    def gather(self, pending, keyed):
+        """ Append queued up records to the pending records of a batch (a list, or dictionary of lists if keyed). """
+        if keyed:
+            for key, records in self.unpack_keyed().items():
+                pending.setdefault(key, []).extend(records)
+        else:
+            pending.extend(self.unpack())
+
+    @staticmethod
+    def count(pending, keyed):
+        """ Number of pending records of a batch (a list, or dictionary of lists if keyed). """
+        return sum(map(len, pending.values())) if keyed else len(pending)
+
+    async def arrays(self, max_latency=0, keyed=False):
+        """
+        Asynchronously iterate over inbound data, yielding each non-empty read out as a NumPy structured array
+        (or a dictionary of arrays by stream key, if keyed), on data arrival (after gathering for up to max_latency
+        seconds).
+        """
+        arrival = self.register_arrival()
+        try:
+            while not self._is_shutting_down:
+                if not await self.wait_async(arrival, CANCELLATION_CHECK_INTERVAL):
+                    continue
+                if max_latency:
+                    await asyncio.sleep(max_latency)
+                batch = self.unpack_arrays() if keyed else self.unpack_array()
+                if len(batch):
+                    yield batch
+        finally:
+            self.unregister_arrival(arrival)
+
+    async def windows(self, window=base.Window.BLOCK, column=0, key=None, max_idle=1.0, as_array=False):
+        """
+        Asynchronously iterate over inbound data of the keyed (or primary/merged) stream, yielding one batch of records
+        per complete window, as a list (as per unpack) or a NumPy structured array.\n
+        Block windows hold the records sharing a value of the column (e.g. the block time), while scan windows end on
+        a wrap of the column (the azimuth, in degrees). A window is only known to be complete once the next starts, so
+        a pending window is also released where no data arrives for max_idle seconds (None waiting indefinitely).
+        """
+        arrival = self.register_arrival()
+        pending = []
+        last_value = None
+        try:
+            while not self._is_shutting_down:
+                if not await self.wait_async(arrival, max_idle or CANCELLATION_CHECK_INTERVAL):
+                    if max_idle and len(pending):
+                        yield pending
+                        pending = []
+                    continue
+                records = self.unpack_array(key) if as_array else list(self.unpack(key))
+                if not len(records):
+                    continue
+                if as_array:
+                    values = records[f'f{column}']
+                else:
+                    position = self.position(column, key)
+                    values = [record[position] for record in records]
+                starts = self.window_starts(values, window, last_value)
+                last_value = values[-1]
+                previous = 0
+                for start in starts:
+                    batch = self.join(pending, records[previous:start])
+                    pending = []
+                    if len(batch):
+                        yield batch
+                    previous = start
+                pending = self.join(pending, records[previous:])
+        finally:
+            self.unregister_arrival(arrival)
+
+    def position(self, column, key=None):
+        """
+        Position of a column (field index of the layout) within the records read out of the keyed (or merged) stream.\n
+        Records hold the selected columns in layout order, as decoded by the stream, rather than in the declared order.
+        """
+        streams = self.select_streams(key, is_uniform=True)
+        columns = streams[0].columns if streams else None
+        if columns is None:
+            return column
+        if column not in columns:
+            raise ValueError(f"Column {column} not among the columns read out of the inbound stream(s).")
+        return columns.index(column)
+
+    @staticmethod
+    def window_starts(values, window, last_value):
+        """ Indices of the values starting a new window, following on from the last value of the pending window. """
+        if isinstance(values, list):
+            starts = []
+            previous = last_value
+            for i, value in enumerate(values):
+                if previous is not None and ((value != previous) if window == base.Window.BLOCK
+                                             else (float(value) < float(previous) - AZIMUTH_WRAP_THRESHOLD)):
+                    starts.append(i)
+                previous = value
+            return starts
+        if last_value is not None:
+            values = base.numpy.concatenate(([last_value], values))
+        if window == base.Window.BLOCK:
+            starts = base.numpy.flatnonzero(values[1:] != values[:-1]) + 1
+        else:
+            starts = base.numpy.flatnonzero(base.numpy.diff(values) < -AZIMUTH_WRAP_THRESHOLD) + 1
+        return (starts - 1 if last_value is not None else starts).tolist()
+
+    @staticmethod
+    def join(pending, records):
+        """ Join the records to the pending records of a window (lists or NumPy arrays). """
+        if not len(pending):
+            return records
+        return pending + records if isinstance(pending, list) else base.numpy.concatenate((pending, records))
+
+    def notify_arrival(self):
+        """ Signal the arrival of inbound data to any waiting consumers, called from the producing thread. """
+        if not self._arrival.is_set():
+            self._arrival.set()
+        for listener in self._listeners:
+            listener()
+
+    def register_arrival(self):
+        """ Get an event, bound to the running event loop, that is set on arrival of inbound data. """
+        loop = asyncio.get_running_loop()
+        arrival = asyncio.Event()
+
+        def listener():
+            if not arrival.is_set():
+                loop.call_soon_threadsafe(arrival.set)
+        arrival.listener = listener
+        self._listeners = self._listeners + [listener]
+        return arrival
+
+    def unregister_arrival(self, arrival):
+        """ Release an event previously registered to the arrival of inbound data. """
+        self._listeners = [l for l in self._listeners if l is not arrival.listener]
+
+    async def wait_async(self, arrival, timeout):
+        """ Wait for inbound data to be available, returns false where none arrived within the timeout. """
+        if not self.empty():
+            return True
+        arrival.clear()
+        if not self.empty():
+            return True
+        try:
+            await asyncio.wait_for(arrival.wait(), max(timeout, 0))
+        except asyncio.TimeoutError:
+            return False
+        return True
+
+    def wait(self, timeout=None):
+        """ Block the calling thread until inbound data is available or the timeout elapses. """
+        if not self.empty():
+            return True
+        self._arrival.clear()
+        if not self.empty():
+            return True
+        self._arrival.wait(timeout)
+        return not self.empty()
+
     async def loop_async(self):
         """ Initialize a new connection according to the configured endpoint. """
         if (self._endpoint.protocol == base.Protocol.MQTT) or (self._endpoint.protocol == base.Protocol.MQTTS):
             await self.initialize_mqtt_subscriber(self._loop_iteration)
         elif self._endpoint.protocol == base.Protocol.TCP:
             await self.initialize_tcp_sink(self._loop_iteration)
+        elif self._endpoint.protocol == base.Protocol.SHM:
+            await self.initialize_shm_reader(self._loop_iteration)
+        elif self._endpoint.protocol == base.Protocol.UDP:
+            await self.initialize_udp_receiver(self._loop_iteration)
+        elif self._endpoint.protocol == base.Protocol.FILE:
+            await self.initialize_file_reader(self._loop_iteration)
         else:
             self._is_started = False
             print(f"{base.Style.ERROR}unimplemented protocol {self._endpoint.protocol}, input channel cannot be initialized.{base.Style.EOS}", flush=True)
@@ -165,11 +910,8 @@ class InputChannel(base.Component):
         """ Keep queues cleared where not started. """
         loop_iteration_at_init = self.loop_iteration
         while self._is_shutting_down or (not self._is_started and (loop_iteration_at_init == self.loop_iteration)):
-            try:
-                while True:
-                    self._queue.get_nowait()
-            except:
-                pass
+            for stream in self._streams.values():
+                stream.purge()
             if self._is_shutting_down:
                 break
             await asyncio.sleep(FORCED_QUEUE_CLEANUP_INTERVAL)
@@ -177,44 +919,45 @@ class InputChannel(base.Component):
     # -----------------------------------------------------------------------------
     async def initialize_mqtt_subscriber(self, loop_iteration_at_init):
         """ Initialize data input through MQTT. """
-        client = mqtt.Client(client_id=f"{self.local_uid}_incoming", clean_session=True,
-                             userdata=self, protocol=mqtt.MQTTv311, transport='tcp')
-        if self._endpoint.protocol == base.Protocol.MQTTS:
-            # Enables TLS1.2 with externally provided keys/certificates
-            client.tls_set(None, None, None, cert_reqs=ssl.CERT_NONE,
-                           tls_version=ssl.PROTOCOL_TLSv1_2, ciphers=None)
-            # disables peer verification
-            client.tls_insecure_set(True)
+        connection = broker.acquire_connection(self._endpoint, self.local_uid)
+        listener = broker.Listener(self, on_connect, on_disconnect)
+        for topic in self._endpoint.topics:
+            connection.subscribe(topic, on_message, self)
+        connection.add_listener(listener)
         # -------------------------------------------------------------------------
-        client.is_connected = False
-        client.on_connect = on_connect
-        client.on_message = on_message
-        client.on_disconnect = on_disconnect
-        # -------------------------------------------------------------------------
-        print(f"{base.Style.INFO}MQTT subscriber connecting on {self._endpoint.ip_address}:{self._endpoint.port}{' with TLS support' if self._endpoint.protocol == base.Protocol.MQTTS else ''}...{base.Style.EOS}")
-        client.connect_async(self._endpoint.ip_address,
-                             self._endpoint.port, 60)
-        # -------------------------------------------------------------------------
-        # Initialize connection to the broker as configured
-        client.loop_start()
         # Wait for connection setup to complete
-        while not client.is_connected:
-            await asyncio.sleep(1)
+        while not connection.is_connected and self._is_started and (loop_iteration_at_init == self.loop_iteration):
+            await asyncio.sleep(CANCELLATION_CHECK_INTERVAL)
         # -------------------------------------------------------------------------
         while self._endpoint.is_active and self._is_started and (loop_iteration_at_init == self.loop_iteration):
             await asyncio.sleep(CANCELLATION_CHECK_INTERVAL)
         # -------------------------------------------------------------------------
-        print(f"{base.Style.INFO}MQTT subscriber disconnecting...{base.Style.EOS}")
-        client.disconnect()
-        while client.is_connected:
-            await asyncio.sleep(CANCELLATION_CHECK_INTERVAL)
-        client.loop_stop()
+        print(f"{base.Style.INFO}MQTT subscriber releasing connection...{base.Style.EOS}")
+        for topic in self._endpoint.topics:
+            connection.unsubscribe(topic)
+        connection.remove_listener(listener)
+        broker.release_connection(connection)
+        self._endpoint.is_active = False
 
     async def initialize_tcp_sink(self, loop_iteration_at_init):
-        """ Initialize data input through raw TCP. """
+        """ Initialize data input through raw TCP, with a connection per stream. """
+        if not self._streams:
+            self._is_started = False
+            print(f"{base.Style.ERROR}no inbound stream defined, TCP data sink cannot be initialized.{base.Style.EOS}", flush=True)
+            self.status = base.Status.FAILURE
+            return
+        # Preallocated rings receiving the records in place, sized in whole records
+        records = self._queue_config['ringRecords'] if 'ringRecords' in self._queue_config else record_ring.DEFAULT_RING_RECORDS
+        for stream in self._streams.values():
+            if not stream.struct_size:
+                print(f"{base.Style.WARNING}Layout of the {stream.key} stream undefined, TCP data is received as single bytes{base.Style.EOS}")
+            record_size = max(stream.struct_size, 1)
+            stream.ring = record_ring.RecordRing(
+                bytearray(record_ring.RecordRing.size_for(record_size, records)), record_size, initialize=True)
+        connections = {}
         self._event_loop = asyncio.get_event_loop()
         server = await self._event_loop.create_server(
-            lambda: CustomProtocol(self._endpoint, self._queue, self._activity_queue),
+            lambda: CustomProtocol(self._endpoint, self, connections),
             self._endpoint.ip_address, self._endpoint.port, reuse_address=True)
         # -------------------------------------------------------------------------
         print(f"{base.Style.INFO}TCP data sink connection for {self._endpoint.ip_address}:{self._endpoint.port}...{base.Style.EOS}")
@@ -223,13 +966,201 @@ class InputChannel(base.Component):
         async def termination_check(server):
             while self._is_started and (loop_iteration_at_init == self.loop_iteration):
                 await asyncio.sleep(CANCELLATION_CHECK_INTERVAL)
-            server.pause_reading()
             print(f"{base.Style.INFO}TCP data sink disconnecting...{base.Style.EOS}")
+            for connection in list(connections.values()):
+                connection.transport.abort()
             server.close()
-            server.wait_closed()
         # Initialize connection to the broker as configured
         async with server:
             termination_check_task = asyncio.create_task(
                 termination_check(server))
-            await server.serve_forever()
+            try:
+                await server.serve_forever()
+            except asyncio.CancelledError:
+                pass
             await termination_check_task
+        for stream in self._streams.values():
+            stream.release_listener = None
+            stream.ring = None
+
+    async def initialize_udp_receiver(self, loop_iteration_at_init):
+        """ Initialize data input through UDP, joining the multicast group where the address is one. """
+        sock = socket.socket(socket.AF_INET, socket.SOCK_DGRAM, socket.IPPROTO_UDP)
+        sock.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+        sock.setsockopt(socket.SOL_SOCKET, socket.SO_RCVBUF, UDP_RECEIVE_BUFFER_SIZE)
+        is_multicast = ipaddress.ip_address(self._endpoint.ip_address).is_multicast
+        try:
+            sock.bind(('' if is_multicast else self._endpoint.ip_address, self._endpoint.port))
+            if is_multicast:
+                sock.setsockopt(socket.IPPROTO_IP, socket.IP_ADD_MEMBERSHIP, struct.pack(
+                    '4s4s', socket.inet_aton(self._endpoint.ip_address), socket.inet_aton('0.0.0.0')))
+        except OSError as error:
+            sock.close()
+            self._is_started = False
+            print(f"{base.Style.ERROR}UDP data sink cannot be initialized on {self._endpoint.ip_address}:{self._endpoint.port} ({error}).{base.Style.EOS}", flush=True)
+            self.status = base.Status.FAILURE
+            return
+        self._event_loop = asyncio.get_event_loop()
+        transport, _ = await self._event_loop.create_datagram_endpoint(
+            lambda: MulticastProtocol(self._endpoint, self), sock=sock)
+        # -------------------------------------------------------------------------
+        while self._is_started and (loop_iteration_at_init == self.loop_iteration):
+            await asyncio.sleep(CANCELLATION_CHECK_INTERVAL)
+        # -------------------------------------------------------------------------
+        print(f"{base.Style.INFO}UDP data sink disconnecting...{base.Style.EOS}")
+        transport.close()
+
+    async def initialize_file_reader(self, loop_iteration_at_init):
+        """ Initialize data input through replay of recorded files (from the endpoint directory), per stream. """
+        directory = os.path.realpath(self._endpoint.ip_address or './')
+        print(f"{base.Style.INFO}File reader replaying from {directory} {f'at {self._replay_speed}x' if self._replay_speed else 'unthrottled'}...{base.Style.EOS}")
+        self._endpoint.is_active = True
+        await asyncio.gather(*[self.file_reader(directory, stream, loop_iteration_at_init)
+                               for stream in self._streams.values()])
+        if self._is_started and (loop_iteration_at_init == self.loop_iteration):
+            print(f"{base.Style.OK}File replay completed{base.Style.EOS}")
+        self._endpoint.is_active = False
+        # -------------------------------------------------------------------------
+        while self._is_started and (loop_iteration_at_init == self.loop_iteration):
+            await asyncio.sleep(CANCELLATION_CHECK_INTERVAL)
+
+    async def file_reader(self, directory, stream, loop_iteration_at_init):
+        """
+        Replay the recorded files of the stream (_{key}_{n}.dat) in sequence, memory mapped and fed to the stream
+        queue in blocks of records, paced according to the recorded sequence counter unless replayed unthrottled.
+        """
+        _, _, files = next(os.walk(directory), (None, None, []))
+        prefix = f"_{stream.key}_"
+        file_sequences = sorted(int(f[len(prefix):-4]) for f in files
+                                if f.startswith(prefix) and f.endswith('.dat') and f[len(prefix):-4].isdigit())
+        started_at = None
+        first_tick = None
+        for file_sequence in file_sequences:
+            with open(os.path.join(directory, f"{prefix}{file_sequence}.dat"), 'rb') as file:
+                with mmap.mmap(file.fileno(), 0, access=mmap.ACCESS_READ) as mm, memoryview(mm) as buffer:
+                    max_size, stride, start_head, last_head = struct.unpack_from('<QQQQ', buffer, 0)
+                    if stride - 8 != stream.struct_size:
+                        print(f"{base.Style.WARNING}Recorded record size of {stride - 8} on {stream.key} does not match layout ({stream.struct_size}){base.Style.EOS}")
+                        return
+                    count = min(last_head - start_head + 1, max_size // stride) if last_head >= start_head else 0
+                    # An unwritten last head reads as 0, as does that of a first file holding only record 0, which is
+                    # told apart by the record itself (an unwritten record slot being zeroed out)
+                    if (count == 1) and not last_head and not any(
+                            buffer[RECORDING_HEADER_SIZE:RECORDING_HEADER_SIZE + stride]):
+                        count = 0
+                    print(f"{base.Style.INFO} > replaying {stream.key} #{file_sequence} ({count} records)...{base.Style.EOS}")
+                    index = 0
+                    while index < count:
+                        if not self._is_started or (loop_iteration_at_init != self.loop_iteration):
+                            return
+                        # Gather a block of records sharing the sequence counter (tick) of the first
+                        tick = struct.unpack_from('<Q', buffer, RECORDING_HEADER_SIZE + (index * stride))[0]
+                        end = min(index + REPLAY_BLOCK_RECORDS, count)
+                        if self._replay_speed:
+                            for i in range(index + 1, end):
+                                if struct.unpack_from('<Q', buffer, RECORDING_HEADER_SIZE + (i * stride))[0] != tick:
+                                    end = i
+                                    break
+                            if first_tick is None:
+                                started_at, first_tick = asyncio.get_event_loop().time(), tick
+                            await asyncio.sleep(max(started_at + ((tick - first_tick) * RECORDING_TICK_INTERVAL / self._replay_speed)
+                                                    - asyncio.get_event_loop().time(), 0))
+                        # Hold back while the (bounded) queue is full, rather than dropping replayed records
+                        while stream.queue.capacity and (stream.queue.qsize() >= stream.queue.capacity) and self._is_started:
+                            await asyncio.sleep(RECHECK_DATA_IN_QUEUE_INTERVAL)
+                        # Strip the sequence counters, leaving the packed records
+                        stream.queue.put(b''.join(
+                            buffer[offset + 8:offset + stride] for offset in range(
+                                RECORDING_HEADER_SIZE + (index * stride), RECORDING_HEADER_SIZE + (end * stride), stride)))
+                        self.activity_queue.put(end - index)
+                        index = end
+                        await asyncio.sleep(0)
+
+    @staticmethod
+    def attach_shm_ring(stream, mismatched):
+        """
+        Attach to the shared memory ring of a stream, returns the block and ring, or None where not (yet) available.\n
+        A ring of records not matching the layout of the stream is refused, as reading it would misalign every record.
+        The keys of the streams refused are kept in the mismatched set, so that the refusal is reported once.
+        """
+        indices = [index for index, char in enumerate(stream.topic) if char == '/']
+        source = stream.topic[indices[2]+1:indices[3]] if len(indices) > 3 else ''
+        try:
+            block, ring = record_ring.attach_shared_ring(record_ring.shared_memory_name(source, stream.key))
+        except FileNotFoundError:
+            return None
+        if ring.record_size != stream.struct_size:
+            if stream.key not in mismatched:
+                mismatched.add(stream.key)
+                print(f"{base.Style.ERROR}Shared memory record size of {ring.record_size} on {stream.key} does not match layout ({stream.struct_size}), not attaching{base.Style.EOS}")
+            InputChannel.detach_shm_ring(block, ring)
+            return None
+        mismatched.discard(stream.key)
+        return block, ring
+
+    @staticmethod
+    def detach_shm_ring(block, ring):
+        """ Close a ring attached from shared memory, returns false where its buffer is still viewed (by NumPy arrays). """
+        try:
+            ring.close()
+            block.close()
+        except BufferError:
+            return False
+        return True
+
+    async def initialize_shm_reader(self, loop_iteration_at_init):
+        """
+        Initialize data input through the shared memory rings of a co-located sub-system.\n
+        Rings are looked up again at the connection retry interval, so that a ring re-created by a restarted producer
+        (told apart by its generation) is attached anew, once the records left in the stale ring are read out.
+        """
+        streams = list(self._streams.values())
+        blocks = {}
+        retired = []
+        mismatched = set()
+        notified_cursors = {}
+        recheck_time = 0
+        print(f"{base.Style.INFO}Shared memory reader attaching to {len(streams)} stream(s)...{base.Style.EOS}")
+        while self._is_started and (loop_iteration_at_init == self.loop_iteration):
+            if asyncio.get_event_loop().time() >= recheck_time:
+                recheck_time = asyncio.get_event_loop().time() + CONNECTION_RETRY_INTERVAL
+                for stream in streams:
+                    if (stream.ring is not None) and not stream.ring.empty():
+                        continue
+                    attached = self.attach_shm_ring(stream, mismatched)
+                    if attached is None:
+                        continue
+                    block, ring = attached
+                    if stream.ring is not None:
+                        if ring.generation == stream.ring.generation:
+                            self.detach_shm_ring(block, ring)
+                            continue
+                        print(f"{base.Style.WARNING}Shared memory ring of the {stream.key} stream re-created, reattaching...{base.Style.EOS}")
+                        retired.append((blocks[stream.key], stream.ring))
+                    stream.ring = ring
+                    blocks[stream.key] = block
+                    notified_cursors[stream.key] = 0
+                # Rings still viewed by the consumer are closed on a later check
+                retired = [entry for entry in retired if not self.detach_shm_ring(*entry)]
+                if not self._endpoint.is_active and all(stream.ring is not None for stream in streams):
+                    self._endpoint.is_active = True
+                    print(f"{base.Style.OK}Shared memory reader attached{base.Style.EOS}")
+            for stream in streams:
+                if stream.ring is None:
+                    continue
+                write_cursor = stream.ring.write_cursor
+                if write_cursor != notified_cursors.get(stream.key, 0):
+                    self.activity_queue.put(
+                        (write_cursor - notified_cursors.get(stream.key, 0)) // max(stream.ring.record_size, 1))
+                    notified_cursors[stream.key] = write_cursor
+                    self.notify_arrival()
+            await asyncio.sleep(SHM_POLL_INTERVAL)
+        # -------------------------------------------------------------------------
+        print(f"{base.Style.INFO}Shared memory reader detaching...{base.Style.EOS}")
+        for stream in streams:
+            if stream.ring is not None:
+                retired.append((blocks[stream.key], stream.ring))
+                stream.ring = None
+        for block, ring in retired:
+            self.detach_shm_ring(block, ring)
+        self._endpoint.is_active = False
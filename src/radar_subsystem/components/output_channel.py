@@ -5,30 +5,40 @@ Output channel component type classes and functionality
 """
 
 import asyncio
-import concurrent.futures
 import csv
-import datetime
 import io
+import ipaddress
+import itertools
+import operator
 import queue
-import ssl
+import socket
 import struct
-import paho.mqtt.client as mqtt
+import threading
+import time
+import zlib
 
-from .. import base
+from .. import base, broker
+from . import record_ring, spill_log
 
-MQTT_SEND_INTERVAL = 0.25
+MQTT_SEND_INTERVAL = 0.25  # default latency target, where not set by the data schema
 CANCELLATION_CHECK_INTERVAL = 1
 CONNECTION_RETRY_INTERVAL = 2
 RECHECK_DATA_IN_QUEUE_INTERVAL = 0.05
+ENCODER_WAIT_INTERVAL = 0.1
 MAX_SEND_BLOCK_BYTE_SIZE = 16384
+MAX_IN_FLIGHT_MESSAGES = 32
+IN_FLIGHT_DRAIN_TIMEOUT = 2
 FORCED_QUEUE_CLEANUP_INTERVAL = 0.5
+MAX_DATAGRAM_BYTE_SIZE = 1472  # within a standard Ethernet MTU, avoiding IP fragmentation
+MULTICAST_TTL = 1
+SPILL_REPLAY_INTERVAL = 0.05
+DELTA_KEYFRAME_INTERVAL = 60  # default period of full keyframes of delta encoded streams
 
 
 def on_connect(client, channel, flags, result):
     """ The callback for CONNACK response from MQTT input server, where applicable. """
     print(f"{base.Style.OK}MQTT publisher connected{base.Style.EOS}")
     channel.endpoint.is_active = True
-    client.is_connected = True
     channel.status = base.Status.OPERATIONAL
 
 
@@ -36,13 +46,147 @@ def on_disconnect(client, channel, result):
     """ The callback for DISCONNECT response from the server, where applicable. """
     if not result:
         print(f"{base.Style.WARNING}MQTT publisher disconnected{base.Style.EOS}")
+    elif channel.is_spilling:
+        # The client reconnects by itself, with the streams spilled to disk in the meantime
+        channel.status = base.Status.CAUTION
+        print(f"{base.Style.WARNING}MQTT publisher disconnected unexpectedly ({result}), spilling to disk...{base.Style.EOS}")
     else:
         channel.status = base.Status.FAILURE
         channel._is_started = False
         print(f"{base.Style.ERROR}MQTT publisher terminated unexpectedly ({result}){base.Style.EOS}")
-        raise Exception
     channel.endpoint.is_active = False
-    client.is_connected = False
+
+
+def on_publish(client, channel, mid):
+    """ The callback for completion of a publish (acknowledged by the server, where QoS > 0), where applicable. """
+    channel.notify_published()
+
+
+class RecordChunk:
+    """
+    Batch of records enqueued on a pipe at once, held as a list of rows or as a packed NumPy structured array.\n
+    Chunks are interleaved with individually queued rows on the pipe, and consumed by the writers as a whole.
+    """
+
+    __slots__ = ('rows', 'array')
+
+    def __init__(self, rows=None, array=None):
+        self.rows = rows if rows is not None else []
+        self.array = array
+
+    def __len__(self):
+        return len(self.array) if self.array is not None else len(self.rows)
+
+    def first(self):
+        """ First record of the chunk, as a row. """
+        return self.array[:1].tolist()[0] if self.array is not None else self.rows[0]
+
+    def split(self, count):
+        """ Split the chunk into its first count records and the remainder. """
+        if self.array is not None:
+            return RecordChunk(array=self.array[:count]), RecordChunk(array=self.array[count:])
+        return RecordChunk(self.rows[:count]), RecordChunk(self.rows[count:])
+
+    @property
+    def has_strings(self):
+        """ Indicates if the records of an array chunk hold fixed size string fields. """
+        return any(self.array.dtype[i].kind == 'S' for i in range(len(self.array.dtype)))
+
+    def tolist(self):
+        """ Records of the chunk as rows, with fixed size strings decoded for text encoding. """
+        if self.array is None:
+            return self.rows
+        rows = self.array.tolist()
+        if self.has_strings:
+            rows = [[element.decode('utf-8', 'replace') if isinstance(element, bytes) else element for element in row]
+                    for row in rows]
+        return rows
+
+    def tocsv(self):
+        """
+        Records of an array chunk as CSV text, formatted in a single pass rather than row by row.\n
+        Numeric fields are formatted as by a QUOTE_NONNUMERIC CSV writer, so the text is identical to that of the
+        writer. Returns None for chunks that must be written row by row (lists of rows or records holding strings).
+        """
+        if (self.array is None) or self.has_strings:
+            return None
+        row_format = ','.join(['%r'] * len(self.array.dtype)) + '\r\n'
+        return (row_format * len(self.array)) % tuple(itertools.chain.from_iterable(self.array.tolist()))
+
+    def pack_into(self, packer, buffer, offset):
+        """ Pack the records of the chunk into the buffer at the offset, returns the number of bytes packed. """
+        if self.array is not None:
+            nbytes = self.array.nbytes
+            # Written through a memoryview, as a bytearray only takes slice assignment from bytes-like objects
+            memoryview(buffer)[offset:offset + nbytes] = self.array.view(base.numpy.uint8)
+            return nbytes
+        for index, row in enumerate(self.rows):
+            packer.pack_into(buffer, offset + (index * packer.size), *row)
+        return len(self.rows) * packer.size
+
+
+class RecordQueue:
+    """
+    Queue of outbound rows and record chunks of a stream, keeping count of the records queued.\n
+    The count covers the records put on the queue until released by the consumer, so that records dequeued but held
+    back (pending) by the encoder remain counted. The consumer may block until a given count is reached.
+    """
+
+    def __init__(self):
+        self._queue = queue.SimpleQueue()
+        self._condition = threading.Condition()
+        self._count = 0
+        self._awaited_count = None
+
+    @property
+    def count(self):
+        """ Number of records queued, rows counting as single records and chunks as their number of records. """
+        return self._count
+
+    def put(self, item):
+        """ Enqueue a row or record chunk (thread-safe). """
+        self._queue.put(item)
+        with self._condition:
+            self._count += len(item) if isinstance(item, RecordChunk) else 1
+            if (self._awaited_count is not None) and (self._count >= self._awaited_count):
+                self._condition.notify_all()
+
+    def wait_count(self, count, timeout):
+        """ Block until at least count records are queued, returns false where not reached within the timeout. """
+        with self._condition:
+            self._awaited_count = count
+            try:
+                return self._condition.wait_for(lambda: self._count >= count, timeout)
+            finally:
+                self._awaited_count = None
+
+    def get(self, block=True, timeout=None):
+        """ Dequeue the next item, blocking up to the timeout where set (raises queue.Empty where none arrived). """
+        return self._queue.get(block, timeout)
+
+    def get_nowait(self):
+        """ Dequeue the next item without blocking (raises queue.Empty where none is queued). """
+        return self._queue.get_nowait()
+
+    def empty(self):
+        """ Indicates if no items are queued. """
+        return self._queue.empty()
+
+    def qsize(self):
+        """ Approximate number of items (rows or chunks) queued. """
+        return self._queue.qsize()
+
+    def release(self, count):
+        """ Deduct records consumed (or dropped) from the count, called by the consumer of the queue. """
+        with self._condition:
+            self._count -= count
+
+    def clear(self):
+        """ Discard all queued items, along with any records held back by the consumer. """
+        with self._condition:
+            while not self._queue.empty():
+                self._queue.get_nowait()
+            self._count = 0
 
 
 class OutputChannel(base.Component):
@@ -64,14 +208,33 @@ class OutputChannel(base.Component):
             self._stream_keys.append(key)
             field_types = types.split(',')
             self._pipes[key] = {
+                'data_types': types,
                 'struct_format': base.dataTypesToFormat(types) if types else None,
                 'struct_field_formats': [base.dataTypesToFormat(field_types[i]) for i in range(len(field_types))] if types else None,
                 'struct_size': base.dataTypesToSize(types) if types else 0,
                 'struct_field_sizes': [base.dataTypesToSize(field_types[i]) for i in range(len(field_types))] if types else 0,
-                'queue': queue.SimpleQueue()
+                'struct': struct.Struct(base.dataTypesToFormat(types)) if types else None,
+                'content_type': data_item['type'] if 'type' in data_item else 'text/csv',
+                'compression': base.Compression.from_config(data_item['compression'] if 'compression' in data_item else None),
+                'latency_target': base.isoDurationToSeconds(
+                    data_item['latencyTarget'] if 'latencyTarget' in data_item else MQTT_SEND_INTERVAL),
+                'max_block_size': data_item['maxBlockSize'] if 'maxBlockSize' in data_item else MAX_SEND_BLOCK_BYTE_SIZE,
+                'csv_record_size': None,
+                'queue': RecordQueue(),
+                'pending': [],
+                'spill': data_item['spill'] if 'spill' in data_item else None,
+                'conflate_column': self.column_index(data_item['conflate'], data_item) if 'conflate' in data_item else None,
+                'delta': self.delta_state(data_item) if 'delta' in data_item else None
             }
         self._endpoint = None
         self._writer = None
+        self._content_type = None
+        self._compression = None
+        self._in_flight_window = MAX_IN_FLIGHT_MESSAGES
+        self._qos = 0
+        self._in_flight = []
+        self._published = None
+        self._payloads_ready = None
 
     @property
     def endpoint(self):
@@ -82,11 +245,258 @@ class OutputChannel(base.Component):
     def endpoint(self, value):
         self._endpoint = value
 
+    @property
+    def content_type(self):
+        """ [OPTIONAL] Payload type negotiated for all streams, overriding the data schema types where set. """
+        return self._content_type
+
+    @content_type.setter
+    def content_type(self, value):
+        self._content_type = value
+
+    def is_binary(self, key):
+        """ Indicates if the stream is published as struct packed records, rather than CSV text. """
+        return (self._content_type or self._pipes[key]['content_type']) == base.BINARY_CONTENT_TYPE
+
+    @property
+    def compression(self):
+        """ [OPTIONAL] Payload compression negotiated for all streams, overriding the data schema compression where set. """
+        return self._compression
+
+    @compression.setter
+    def compression(self, value):
+        self._compression = value
+
+    @property
+    def in_flight_window(self):
+        """ Maximum number of published payloads awaiting completion, before further publishing waits. """
+        return self._in_flight_window
+
+    @in_flight_window.setter
+    def in_flight_window(self, value):
+        self._in_flight_window = max(int(value), 1)
+
+    @property
+    def qos(self):
+        """ MQTT quality of service level of the published payloads. """
+        return self._qos
+
+    @qos.setter
+    def qos(self, value):
+        self._qos = int(value)
+
+    @property
+    def is_spilling(self):
+        """ Indicates if any of the streams spills its payloads to disk while disconnected from the broker. """
+        return any(block['spill'] is not None for block in self._blocks.values())
+
+    def compression_for(self, key):
+        """ Compression applied to the payloads of the stream, None where uncompressed. """
+        return self._compression or self._pipes[key]['compression']
+
     @property
     def pipes(self):
         """ Dictionary of cross threaded queues for outbound data. """
         return self._pipes
 
+    def put_many(self, key, rows):
+        """ Enqueue a batch of records (rows of field values) on the keyed stream at once, as a single chunk. """
+        rows = list(rows)
+        if rows:
+            self._pipes[key]['queue'].put(RecordChunk(rows))
+
+    def put_array(self, key, array):
+        """
+        Enqueue the records of a NumPy array on the keyed stream at once, as a single chunk (requires NumPy).\n
+        The array is either structured or two-dimensional (a row per record), with its fields (columns) in the order of
+        the data schema types. The records are packed according to the data schema once, on enqueueing.
+        """
+        if not len(array):
+            return
+        dtype = base.dataTypesToDtype(self._pipes[key]['data_types'])
+        packed = base.numpy.empty(len(array), dtype)
+        if array.dtype.names:
+            # Assignment between structured arrays is by field position
+            packed[...] = array
+        else:
+            columns = array.reshape(len(array), -1)
+            for index, name in enumerate(dtype.names):
+                packed[name] = columns[:, index]
+        self._pipes[key]['queue'].put(RecordChunk(array=packed))
+
+    @staticmethod
+    def queued(pipe):
+        """ Indicates if records are queued on the pipe. """
+        return bool(pipe['pending']) or not pipe['queue'].empty()
+
+    @staticmethod
+    def take(pipe, limit):
+        """
+        Dequeue up to limit records from the pipe (without blocking), as a chunk.\n
+        Individually queued rows and row chunks are joined, whereas array chunks are taken on their own. The part of a
+        chunk beyond the limit is held back (pending) for the next take.
+        """
+        rows = []
+        pending = pipe['pending']
+        while len(rows) < limit:
+            if pending:
+                item = pending.pop(0)
+            else:
+                try:
+                    item = pipe['queue'].get_nowait()
+                except queue.Empty:
+                    break
+            if not isinstance(item, RecordChunk):
+                rows.append(item)
+                continue
+            if (item.array is not None) and rows:
+                pending.insert(0, item)
+                break
+            if len(item) > limit - len(rows):
+                item, remainder = item.split(limit - len(rows))
+                pending.insert(0, remainder)
+            if item.array is not None:
+                pipe['queue'].release(len(item))
+                return item
+            rows.extend(item.rows)
+        pipe['queue'].release(len(rows))
+        return RecordChunk(rows)
+
+    @staticmethod
+    def column_index(column, data_item):
+        """ Index of a column of the stream, given by index or by name (in the header of the stream). """
+        if isinstance(column, int):
+            return column
+        header = data_item['header'].split(',') if 'header' in data_item else []
+        if column not in header:
+            raise ValueError(f"Column \"{column}\" not in the header of the {data_item['key']} stream.")
+        return header.index(column)
+
+    @classmethod
+    def delta_state(cls, data_item):
+        """
+        State of the delta encoding of a stream, from the data schema's delta setting (true or a dictionary of settings).\n
+        Cells are keyed by all columns other than the value column, which defaults to the last column of the layout.
+        """
+        settings = data_item['delta'] if isinstance(data_item['delta'], dict) else {}
+        field_count = len(data_item['dataTypes'].split(','))
+        column = cls.column_index(settings['value'], data_item) if 'value' in settings else field_count - 1
+        key_columns = [index for index in range(field_count) if index != column]
+        return {
+            'column': column,
+            'cell_key': operator.itemgetter(*key_columns) if key_columns else (lambda row: None),
+            'threshold': settings['threshold'] if 'threshold' in settings else 0,
+            'keyframe_interval': base.isoDurationToSeconds(
+                settings['keyframe'] if 'keyframe' in settings else DELTA_KEYFRAME_INTERVAL),
+            'keyframe_time': 0,
+            'cells': {}
+        }
+
+    def reduce(self, pipe):
+        """ Apply the delta encoding and conflation of the stream, where enabled, to the records queued on the pipe. """
+        if pipe['delta'] is not None:
+            pipe['queue'].release(self.delta_encode(pipe))
+        if pipe['conflate_column'] is not None:
+            pipe['queue'].release(self.conflate(pipe))
+
+    @staticmethod
+    def dequeue(pipe):
+        """ Dequeue the items currently queued on the pipe (without blocking), returns the dequeued items. """
+        items = []
+        for _ in range(pipe['queue'].qsize()):
+            try:
+                items.append(pipe['queue'].get_nowait())
+            except queue.Empty:
+                break
+        return items
+
+    @classmethod
+    def gather(cls, pipe):
+        """ Move the items currently queued on the pipe to its pending items, returns the pending items. """
+        items = pipe['pending']
+        items.extend(cls.dequeue(pipe))
+        return items
+
+    @classmethod
+    def conflate(cls, pipe):
+        """
+        Reduce the records queued on the pipe to the newest record per key (the value of the conflation column), returns
+        the number of records dropped.\n
+        The retained records keep their order, with the records queued since the start of the call left for the next.
+        """
+        column = pipe['conflate_column']
+        items = cls.gather(pipe)
+        # Walking back from the newest record, only the first record seen per key is retained
+        keys_seen = set()
+        conflated = []
+        count = 0
+        for item in reversed(items):
+            if not isinstance(item, RecordChunk):
+                keys = [item[column]]
+            elif item.array is not None:
+                keys = item.array[item.array.dtype.names[column]].tolist()
+            else:
+                keys = [row[column] for row in item.rows]
+            retained = []
+            for index in range(len(keys) - 1, -1, -1):
+                if keys[index] not in keys_seen:
+                    keys_seen.add(keys[index])
+                    retained.append(index)
+            count += len(keys)
+            if not retained:
+                continue
+            retained.reverse()
+            if not isinstance(item, RecordChunk):
+                conflated.append(item)
+            elif item.array is not None:
+                conflated.append(item if len(retained) == len(keys) else RecordChunk(array=item.array[retained]))
+            else:
+                conflated.append(item if len(retained) == len(keys) else RecordChunk([item.rows[i] for i in retained]))
+        conflated.reverse()
+        items[:] = conflated
+        return count - len(keys_seen)
+
+    @classmethod
+    def delta_encode(cls, pipe):
+        """
+        Reduce the records newly queued on the pipe to the cells whose value changed beyond the threshold since last
+        sent, appending them to the pending items, returns the number of records dropped (negative where a keyframe adds
+        records).\n
+        The last sent record of every cell is retained, with all cells sent as a keyframe once per keyframe interval
+        (and on the first cycle), so that subscribers joining later catch up on the full grid. Pending items were encoded
+        on an earlier cycle and are left as they are, as their rows are already accounted for in the retained cells.
+        """
+        delta = pipe['delta']
+        items = cls.dequeue(pipe)
+        rows = []
+        for item in items:
+            if not isinstance(item, RecordChunk):
+                rows.append(item)
+            else:
+                rows.extend(item.array.tolist() if item.array is not None else item.rows)
+        cells = delta['cells']
+        cell_key = delta['cell_key']
+        now = time.monotonic()
+        if now >= delta['keyframe_time']:
+            for row in rows:
+                cells[cell_key(row)] = row
+            delta['keyframe_time'] = now + delta['keyframe_interval']
+            if cells:
+                pipe['pending'].append(RecordChunk(list(cells.values())))
+            return len(rows) - len(cells)
+        column = delta['column']
+        threshold = delta['threshold']
+        changed = []
+        for row in rows:
+            key = cell_key(row)
+            sent = cells.get(key)
+            if (sent is None) or (abs(row[column] - sent[column]) > threshold):
+                cells[key] = row
+                changed.append(row)
+        if changed:
+            pipe['pending'].append(RecordChunk(changed))
+        return len(rows) - len(changed)
+
     @property
     def stream_keys(self):
         """ Output data topic streams produced by the sub-system. """
@@ -99,10 +509,18 @@ class OutputChannel(base.Component):
 
     async def loop_async(self):
         """ Initialize a new connection according to the configured endpoint. """
+        for pipe in self._pipes.values():
+            if pipe and pipe['delta'] is not None:
+                # Consumers of a new connection start off with a full keyframe
+                pipe['delta']['keyframe_time'] = 0
         if (self._endpoint.protocol == base.Protocol.MQTT) or (self._endpoint.protocol == base.Protocol.MQTTS):
             await self.initialize_mqtt_publisher(self._loop_iteration)
         elif self._endpoint.protocol == base.Protocol.TCP:
             await self.initialize_tcp_sender(self._loop_iteration)
+        elif self._endpoint.protocol == base.Protocol.SHM:
+            await self.initialize_shm_writer(self._loop_iteration)
+        elif self._endpoint.protocol == base.Protocol.UDP:
+            await self.initialize_udp_sender(self._loop_iteration)
         else:
             self._is_started = False
             print(f"{base.Style.ERROR}unimplemented protocol {self._endpoint.protocol}, output channel cannot be initialized.{base.Style.EOS}", flush=True)
@@ -110,19 +528,13 @@ class OutputChannel(base.Component):
 
     async def purge_loop_async(self):
         """ Keep queues cleared where not started. """
-        queues = []
         loop_iteration_at_init = self.loop_iteration
         while not self._is_started and (loop_iteration_at_init == self.loop_iteration):
             for key, pipe in self._pipes.items():
-                if not pipe or pipe['queue'].empty():
+                if not pipe:
                     continue
-                queues.append(pipe['queue'])
-            for queue in queues:
-                try:
-                    while True:
-                        queue.get_nowait()
-                except:
-                    pass
+                pipe['pending'].clear()
+                pipe['queue'].clear()
             if self._is_shutting_down:
                 break
             await asyncio.sleep(FORCED_QUEUE_CLEANUP_INTERVAL)
@@ -130,170 +542,473 @@ class OutputChannel(base.Component):
     # -----------------------------------------------------------------------------
     async def initialize_mqtt_publisher(self, loop_iteration_at_init):
         """ Initialize data output through MQTT. """
-        client = mqtt.Client(client_id=f"{self.local_uid}_outgoing", clean_session=True,
-                             userdata=self, protocol=mqtt.MQTTv311, transport='tcp')
-        if self._endpoint.protocol == base.Protocol.MQTTS:
-            # Enables TLS1.2 with externally provided keys/certificates
-            client.tls_set(None, None, None, cert_reqs=ssl.CERT_NONE,
-                           tls_version=ssl.PROTOCOL_TLSv1_2, ciphers=None)
-            # disables peer verification
-            client.tls_insecure_set(True)
-        # -------------------------------------------------------------------------
-        client.is_connected = False
-        client.on_connect = on_connect
-        client.on_disconnect = on_disconnect
         for topic in self._endpoint.topics:
             indices = [index for index,
                        char in enumerate(topic) if char == '/']
             key = topic[indices[-2]+1:indices[-1]]
-            stringIo = io.StringIO()
+            # CSV rows are encoded straight into a byte buffer, so blocks are cut at their actual byte size
+            bytesIo = io.BytesIO()
+            textIo = io.TextIOWrapper(bytesIo, encoding='utf-8', newline='', write_through=True)
             self._blocks[key] = {
                 'topic': topic,
-                'write_buffer': stringIo,
-                'writer': csv.writer(stringIo, quoting=csv.QUOTE_NONNUMERIC),
-                'payloads': queue.SimpleQueue()
+                'write_buffer': bytesIo,
+                'text_buffer': textIo,
+                'writer': csv.writer(textIo, quoting=csv.QUOTE_NONNUMERIC),
+                'is_binary': self.is_binary(key),
+                'compression': self.compression_for(key),
+                'payloads': queue.SimpleQueue(),
+                'spill': spill_log.SpillLog.from_config(
+                    self._pipes[key]['spill'], spill_log.spill_directory(self.local_uid), key),
+                'replay_credit': 0,
+                'replay_time': 0
             }
         # -------------------------------------------------------------------------
-        print(f"{base.Style.INFO}MQTT publisher connecting on {self._endpoint.ip_address}:{self._endpoint.port}{' with TLS support' if self._endpoint.protocol == base.Protocol.MQTTS else ''}...{base.Style.EOS}")
-        client.connect_async(self._endpoint.ip_address,
-                             self._endpoint.port, 60)
+        # Initialize (or share) the connection to the broker as configured
+        connection = broker.acquire_connection(self._endpoint, self.local_uid)
+        listener = broker.Listener(self, on_connect, on_disconnect, on_publish=on_publish)
+        connection.add_listener(listener)
+        client = connection.client
+        if self._qos:
+            # Acknowledged messages are otherwise held back by the client's own in-flight limit
+            client.max_inflight_messages_set(max(self._in_flight_window, 20))
+        self._in_flight = []
+        self._published = asyncio.Event()
+        self._payloads_ready = asyncio.Event()
+        # One long-lived encoder per stream, continuously draining its pipe into packed payloads
+        encoders = {}
         # -------------------------------------------------------------------------
-        # Initialize connection to the broker as configured
-        client.loop_start()
-        # Wait for connection setup to complete
-        while not client.is_connected:
-            await asyncio.sleep(1)
-        default_time_delta = datetime.timedelta(0, MQTT_SEND_INTERVAL)
-        next_send_at = None
-        futures = []
-        # -------------------------------------------------------------------------
-        with concurrent.futures.ThreadPoolExecutor(max_workers=8) as executor:
-            while self._is_started and (loop_iteration_at_init == self.loop_iteration):
-                next_send_at = datetime.datetime.utcnow() + default_time_delta
-                for key, pipe in self._pipes.items():
-                    if self._is_started:
-                        await self.mqtt_sender(client, self._blocks[key])
-                for key, pipe in self._pipes.items():
-                    if self._is_started and pipe and not pipe['queue'].empty():
-                        # await self.mqtt_writer(self._blocks[key], pipe)
-                        futures.append(executor.submit(
-                            asyncio.run, self.mqtt_writer(self._blocks[key], pipe)))
-                for future in futures:
-                    if future.done():
-                        futures.remove(future)
-                await asyncio.sleep(max(1E-3, (next_send_at - datetime.datetime.utcnow()).total_seconds()))
-            executor.shutdown()
-            for future in concurrent.futures.as_completed(futures):
-                futures.remove(future)
+        # Publishing is driven by the encoders handing over payloads, rather than a fixed tick
+        while self._is_started and (loop_iteration_at_init == self.loop_iteration):
+            # Streams spilling to disk are encoded (and spilled) from the start, so that records queued while the
+            # broker is unreachable do not pile up in memory, whereas other streams wait for the first connection
+            for key, block in self._blocks.items():
+                if (key not in encoders) and (connection.is_connected or (block['spill'] is not None)):
+                    encoders[key] = threading.Thread(target=self.encoder, args=(
+                        block, self._pipes[key], loop_iteration_at_init), daemon=True)
+                    encoders[key].start()
+            is_replaying = self._endpoint.is_active and any(
+                block['spill'] for block in self._blocks.values() if block['spill'] is not None)
+            if not await self.wait_payloads(SPILL_REPLAY_INTERVAL if is_replaying else CANCELLATION_CHECK_INTERVAL) \
+                    and not is_replaying:
+                continue
+            for block in self._blocks.values():
+                if self._is_started:
+                    await self.mqtt_sender(client, block)
+        for encoder in encoders.values():
+            encoder.join(2)
+        # Allow the payloads still in flight to complete, before releasing the connection
+        deadline = self._event_loop.time() + IN_FLIGHT_DRAIN_TIMEOUT
+        while self.prune_in_flight() and connection.is_connected and (self._event_loop.time() < deadline):
+            await self.wait_published(deadline - self._event_loop.time())
         # -------------------------------------------------------------------------
-        print(f"{base.Style.INFO}MQTT publisher disconnecting...{base.Style.EOS}")
+        print(f"{base.Style.INFO}MQTT publisher releasing connection...{base.Style.EOS}")
         for topic in self._endpoint.topics:
             indices = [index for index,
                        char in enumerate(topic) if char == '/']
             key = topic[indices[-2]+1:indices[-1]]
-            self._blocks[key]['write_buffer'].close()
-        client.disconnect()
-        while client.is_connected:
-            await asyncio.sleep(CANCELLATION_CHECK_INTERVAL)
-        client.loop_stop()
+            self._blocks[key]['text_buffer'].close()
+            if self._blocks[key]['spill'] is not None:
+                if len(self._blocks[key]['spill']):
+                    print(f"{base.Style.WARNING}Discarding {len(self._blocks[key]['spill'])} spilled payload(s) of the {key} stream{base.Style.EOS}")
+                self._blocks[key]['spill'].close()
+        connection.remove_listener(listener)
+        broker.release_connection(connection)
+        self._endpoint.is_active = False
 
     async def initialize_tcp_sender(self, loop_iteration_at_init):
-        """ Initialize data output through raw TCP. """
+        """ Initialize data output through raw TCP, with a connection per stream named by its preamble. """
         # -------------------------------------------------------------------------
         await asyncio.sleep(3)
-        topic = self._endpoint.topics[0]
-        indices = [index for index, char in enumerate(topic) if char == '/']
-        key = topic[indices[-2]+1:indices[-1]]
-        pipe = self._pipes[key]
+        keys = [key for key in self.stream_keys if self._pipes[key] and self._pipes[key]['struct']]
         # -------------------------------------------------------------------------
-        print(f"{base.Style.INFO}TCP sender connecting to {self._endpoint.ip_address}:{self._endpoint.port}...{base.Style.EOS}")
+        print(f"{base.Style.INFO}TCP sender connecting {len(keys)} stream(s) to {self._endpoint.ip_address}:{self._endpoint.port}...{base.Style.EOS}")
         self._endpoint.is_active = True
+
+        async def stream_sender(key):
+            while self._is_started and (loop_iteration_at_init == self.loop_iteration):
+                await self.tcp_writer(key, self._pipes[key], loop_iteration_at_init, self.compression_for(key))
+                if self._is_started:
+                    await asyncio.sleep(CONNECTION_RETRY_INTERVAL)
         # -------------------------------------------------------------------------
-        while self._is_started and (loop_iteration_at_init == self.loop_iteration):
-            # await self.tcp_writer(pipe, loop_iteration_at_init)
-            await asyncio.gather(self.tcp_writer(pipe, loop_iteration_at_init))
-            if self._is_started:
-                await asyncio.sleep(CONNECTION_RETRY_INTERVAL)
+        await asyncio.gather(*(stream_sender(key) for key in keys))
         # -------------------------------------------------------------------------
         print(f"{base.Style.WARNING}TCP sender disconnected{base.Style.EOS}")
 
-    # -----------------------------------------------------------------------------
-    async def mqtt_writer(self, block, pipe):
-        """ Queue interpreter to packing of data for polled publishing. """
-        first_entry = pipe['queue'].get()
-        # pipe['queue'].task_done()
-        entry_size = int(1.2 * sum(map(len, (str(element) for element in first_entry))))
-        number_of_entries = pipe['queue'].qsize()
-        total_size = number_of_entries * entry_size
-        number_of_blocks = max(total_size // MAX_SEND_BLOCK_BYTE_SIZE, 1)
-        block_length = number_of_entries // number_of_blocks
-        self.activity_queue.put(number_of_entries)
+    async def initialize_shm_writer(self, loop_iteration_at_init):
+        """ Initialize data output through shared memory rings, for reading by co-located sub-systems. """
+        rings = {}
+        for key, pipe in self._pipes.items():
+            if pipe and pipe['struct']:
+                rings[key] = record_ring.create_shared_ring(
+                    record_ring.shared_memory_name(self.local_uid, key), pipe['struct'].size)
         # -------------------------------------------------------------------------
-        ranges = []
-        from_entry_index = 0
-        if number_of_blocks:
-            for i in range(0, number_of_blocks):
-                if not self._is_started:
-                    return
-                to_entry_index = from_entry_index + block_length
-                ranges.append(range(from_entry_index, to_entry_index))
-                from_entry_index = to_entry_index + 1
-        ranges.append(range(from_entry_index, number_of_entries - 1))
-        if not block['writer']:
-            print(f"{base.Style.WARNING}Missing CSV writer", flush=True)
-            self.endpoint.is_active = False
-            self.is_running = False
-            self.status = base.Status.FAILURE
-            await self.start_async()
-            return
+        print(f"{base.Style.OK}Shared memory writer created {len(rings)} ring(s){base.Style.EOS}")
+        self._endpoint.is_active = True
+        # -------------------------------------------------------------------------
+        while self._is_started and (loop_iteration_at_init == self.loop_iteration):
+            for key, (_, ring) in rings.items():
+                await self.shm_writer(self._pipes[key], ring)
+            await asyncio.sleep(RECHECK_DATA_IN_QUEUE_INTERVAL)
+        # -------------------------------------------------------------------------
+        print(f"{base.Style.INFO}Shared memory writer releasing rings...{base.Style.EOS}")
+        self._endpoint.is_active = False
+        for block, ring in rings.values():
+            ring.close()
+            try:
+                block.close()
+            except BufferError:
+                pass
+            block.unlink()
+
+    async def initialize_udp_sender(self, loop_iteration_at_init):
+        """ Initialize data output through UDP, as datagrams sent once to the (multicast) group for all consumers. """
+        sock = socket.socket(socket.AF_INET, socket.SOCK_DGRAM, socket.IPPROTO_UDP)
+        if ipaddress.ip_address(self._endpoint.ip_address).is_multicast:
+            sock.setsockopt(socket.IPPROTO_IP, socket.IP_MULTICAST_TTL, MULTICAST_TTL)
+        self._event_loop = asyncio.get_event_loop()
+        transport, _ = await self._event_loop.create_datagram_endpoint(
+            asyncio.DatagramProtocol, sock=sock)
+        sequences = {key: 0 for key in self._pipes}
+        # -------------------------------------------------------------------------
+        print(f"{base.Style.OK}UDP sender sending to {self._endpoint.ip_address}:{self._endpoint.port}{base.Style.EOS}")
+        self._endpoint.is_active = True
+        # -------------------------------------------------------------------------
+        while self._is_started and (loop_iteration_at_init == self.loop_iteration):
+            for key, pipe in self._pipes.items():
+                if pipe and pipe['struct']:
+                    sequences[key] = await self.udp_writer(key, pipe, transport, sequences[key])
+            await asyncio.sleep(RECHECK_DATA_IN_QUEUE_INTERVAL)
+        # -------------------------------------------------------------------------
+        print(f"{base.Style.INFO}UDP sender closing...{base.Style.EOS}")
+        self._endpoint.is_active = False
+        transport.close()
+
+    # -----------------------------------------------------------------------------
+    def encoder(self, block, pipe, loop_iteration_at_init):
+        """
+        Encoder of a stream (run on its own thread), packing queued up data into payloads for publishing.\n
+        Following the arrival of data, the encoder holds off until the stream's latency target has elapsed, or flushes
+        early once a block's worth of bytes is queued, so that light streams are published promptly and heavy streams
+        in full blocks. An idle stream leaves the encoder blocked on its pipe.
+        """
+        writer = self.mqtt_binary_writer if block['is_binary'] else self.mqtt_writer
+        while self._is_started and (loop_iteration_at_init == self.loop_iteration):
+            if not pipe['pending']:
+                try:
+                    pipe['pending'].append(pipe['queue'].get(timeout=ENCODER_WAIT_INTERVAL))
+                except queue.Empty:
+                    continue
+            deadline = time.monotonic() + pipe['latency_target']
+            # Never reached where the size of the records is not known yet, holding off for the latency target instead
+            records_per_block = self.block_records(pipe, block['is_binary']) or float('inf')
+            # Woken by the pipe once a full block is queued, rechecking for a stop at the encoder's wait interval
+            while self._is_started:
+                remaining = deadline - time.monotonic()
+                if (remaining <= 0) or pipe['queue'].wait_count(records_per_block, min(remaining, ENCODER_WAIT_INTERVAL)):
+                    break
+            self.reduce(pipe)
+            writer(block, pipe)
+            self.notify_payloads()
+
+    @staticmethod
+    def block_records(pipe, is_binary):
+        """
+        Number of records filling a block of the stream's maximum block size, None where not known yet.\n
+        Packed records are of a fixed size, whereas the size of CSV rows is that measured on the rows last written.
+        """
+        record_size = pipe['struct'].size if is_binary else pipe['csv_record_size']
+        return max(int(pipe['max_block_size'] // record_size), 1) if record_size else None
+
+    def notify_payloads(self):
+        """ Signal payloads ready for publishing to the publisher, called from the encoder threads. """
+        payloads_ready = self._payloads_ready
+        if payloads_ready is not None and self._event_loop is not None and not self._event_loop.is_closed():
+            self._event_loop.call_soon_threadsafe(payloads_ready.set)
+
+    async def wait_payloads(self, timeout):
+        """ Wait for payloads ready for publishing, returns false where none were handed over within the timeout. """
+        self._payloads_ready.clear()
+        if any(not block['payloads'].empty() for block in self._blocks.values()):
+            return True
+        try:
+            await asyncio.wait_for(self._payloads_ready.wait(), max(timeout, 0))
+        except asyncio.TimeoutError:
+            return False
+        return True
+
+    def mqtt_writer(self, block, pipe):
+        """
+        Queue interpreter packing CSV rows into payloads for publishing, cut at the stream's block byte budget.\n
+        A row taking a block over the budget starts the next block instead, so payloads only exceed the budget where
+        holding a single oversized row. All records queued at the start of the call are written (including those held
+        back as pending), with the average size of the rows kept for the early flush of the encoder.
+        """
+        budget = pipe['max_block_size']
+        write_buffer = block['write_buffer']
+        remaining = pipe['queue'].count
+        count = 0
+        nbytes = 0
         # -------------------------------------------------------------------------
         try:
-            block['writer'].writerow(first_entry)
-            for i in range(0, len(ranges)):
-                for j in ranges[i]:
-                    if self._is_started:
-                        block['writer'].writerow(pipe['queue'].get())
-                block['payloads'].put(block['write_buffer'].getvalue())
-                block['write_buffer'].truncate(0)
-                block['write_buffer'].seek(0)
+            while (remaining > 0) and self._is_started:
+                chunk = self.take(pipe, remaining)
+                if not chunk:
+                    break
+                remaining -= len(chunk)
+                count += len(chunk)
+                text = chunk.tocsv()
+                if text is not None:
+                    text = text.encode('utf-8')
+                    nbytes += len(text)
+                    self.write_csv_text(block, text, budget)
+                    continue
+                for entry in chunk.tolist():
+                    row_start = write_buffer.tell()
+                    block['writer'].writerow(entry)
+                    nbytes += write_buffer.tell() - row_start
+                    if row_start and (write_buffer.tell() > budget):
+                        with write_buffer.getbuffer() as view:
+                            payload, remainder = bytes(view[:row_start]), bytes(view[row_start:])
+                        block['payloads'].put(self.encode(block, payload))
+                        write_buffer.seek(0)
+                        write_buffer.truncate()
+                        write_buffer.write(remainder)
+            if write_buffer.tell():
+                block['payloads'].put(self.encode(block, write_buffer.getvalue()))
         except Exception as x:
             print(f"{base.Style.WARNING}CSV writing terminated with:\n  -> \"{x}\"{base.Style.EOS}", flush=True)
-            block['writer'] = None
-            pass
+        if count:
+            pipe['csv_record_size'] = nbytes / count
+        self.activity_queue.put(count)
+        # The buffer is owned by this stream's encoder alone, so it is simply reset for the next payloads
+        write_buffer.seek(0)
+        write_buffer.truncate()
+
+    def write_csv_text(self, block, text, budget):
+        """ Append CSV rows encoded as a whole to the write buffer, cutting payloads at row ends within the budget. """
+        write_buffer = block['write_buffer']
+        view = memoryview(text)
+        position = 0
+        while len(text) - position > budget - write_buffer.tell():
+            row_end = text.rfind(b'\r\n', position, position + budget - write_buffer.tell())
+            if row_end < 0:
+                if write_buffer.tell():
+                    block['payloads'].put(self.encode(block, write_buffer.getvalue()))
+                    write_buffer.seek(0)
+                    write_buffer.truncate()
+                    continue
+                # A single row exceeding the budget on its own, held by a payload of its own
+                row_end = text.find(b'\r\n', position)
+            write_buffer.write(view[position:row_end + 2])
+            block['payloads'].put(self.encode(block, write_buffer.getvalue()))
+            write_buffer.seek(0)
+            write_buffer.truncate()
+            position = row_end + 2
+        write_buffer.write(view[position:])
+
+    def mqtt_binary_writer(self, block, pipe):
+        """
+        Queue interpreter to packing of data as struct packed records, for polled publishing.\n
+        All records queued at the start of the call are packed (including those held back as pending), into payloads of
+        up to a block's worth of records.
+        """
+        packer = pipe['struct']
+        records_per_block = self.block_records(pipe, True)
+        write_buffer = bytearray(records_per_block * packer.size)
+        remaining = pipe['queue'].count
+        count = 0
+        # -------------------------------------------------------------------------
+        try:
+            while (remaining > 0) and self._is_started:
+                chunk = self.take(pipe, records_per_block)
+                if not chunk:
+                    break
+                remaining -= len(chunk)
+                count += len(chunk)
+                if chunk.array is not None:
+                    block['payloads'].put(self.encode(block, chunk.array.tobytes()))
+                else:
+                    nbytes = chunk.pack_into(packer, write_buffer, 0)
+                    block['payloads'].put(self.encode(block, bytes(write_buffer[:nbytes])))
+        except struct.error as x:
+            print(f"{base.Style.WARNING}Record packing terminated with:\n  -> \"{x}\"{base.Style.EOS}", flush=True)
+        self.activity_queue.put(count)
+
+    @staticmethod
+    def encode(block, payload):
+        """ Apply the compression of the block to a packed payload, where enabled. """
+        return block['compression'].compress(payload) if block['compression'] else payload
 
     async def mqtt_sender(self, client, block):
-        """ Dedicated publisher of previously packed message payloads to an associated topic. """
-        payloads_count = block['payloads'].qsize()
-        for i in range(0, payloads_count - 1):
+        """
+        Dedicated publisher of previously packed message payloads to an associated topic.\n
+        Payloads are published without waiting on each in turn, with up to the in-flight window of payloads awaiting
+        completion (tracked through on_publish) across the streams.
+        Where spilling, payloads are appended to the spill log while disconnected and while it holds earlier payloads,
+        which are replayed (in order) at the replay rate of the log once reconnected. Payloads failing to publish (as
+        when the link drops ahead of on_disconnect) are spilled as well. Spilling is only lossless at a QoS of 1 or 2
+        though, as payloads published at QoS 0 are not acknowledged, so are lost where the link drops in transit.
+        """
+        spill = block['spill']
+        if spill is not None:
+            await self.spill_replayer(client, block)
+        while not block['payloads'].empty() and self._is_started:
+            if (spill is not None) and (spill or not self._endpoint.is_active):
+                spill.append(block['payloads'].get())
+                continue
+            if self.prune_in_flight() >= self._in_flight_window:
+                await self.wait_published(CANCELLATION_CHECK_INTERVAL)
+                continue
             payload = block['payloads'].get()
-            if payload and self._is_started:
-                send_data = client.publish(block['topic'], payload)
-                send_data.wait_for_publish()
+            if not payload:
+                continue
+            message = client.publish(block['topic'], payload, qos=self._qos)
+            if (spill is not None) and self.is_unsent(message):
+                spill.append(payload)
+                continue
+            self._in_flight.append(message)
+
+    async def spill_replayer(self, client, block):
+        """
+        Publish the payloads spilled while disconnected, up to the replay rate of the spill log.\n
+        A payload is only removed from the log once accepted by the client, so that a publish failing on a dropped link
+        leaves it at the head of the log for the next replay.
+        """
+        spill = block['spill']
+        now = self._event_loop.time()
+        # Credit accrues at the replay rate, bursting to at most a second's worth of payloads
+        block['replay_credit'] = min(block['replay_credit'] + ((now - block['replay_time']) * spill.replay_rate),
+                                     spill.replay_rate)
+        block['replay_time'] = now
+        while spill and (block['replay_credit'] >= 1) and self._endpoint.is_active and self._is_started:
+            if self.prune_in_flight() >= self._in_flight_window:
+                if not await self.wait_published(SPILL_REPLAY_INTERVAL):
+                    break
+                continue
+            message = client.publish(block['topic'], spill.peek(), qos=self._qos)
+            if self.is_unsent(message):
+                break
+            spill.pop()
+            self._in_flight.append(message)
+            block['replay_credit'] -= 1
+
+    def is_unsent(self, message):
+        """
+        Indicates if a publish failed outright, leaving its payload unsent.\n
+        At a QoS of 1 or 2 the client holds on to payloads published while disconnected, sending them once reconnected,
+        so only publishes it rejected (as with a full queue) count as unsent.
+        """
+        if message.rc == broker.mqtt.MQTT_ERR_SUCCESS:
+            return False
+        return not (self._qos and (message.rc == broker.mqtt.MQTT_ERR_NO_CONN))
+
+    def prune_in_flight(self):
+        """ Drop completed publishes from those in flight, returns the number still awaiting completion. """
+        # Publishes failing outright (as while disconnected) are never completed, so are not awaited either
+        self._in_flight = [message for message in self._in_flight if not message.is_published() and not message.rc]
+        return len(self._in_flight)
+
+    async def wait_published(self, timeout):
+        """ Wait for the completion of a publish in flight, returns false where none completed within the timeout. """
+        self._published.clear()
+        count = len(self._in_flight)
+        if self.prune_in_flight() < count:
+            return True
+        try:
+            await asyncio.wait_for(self._published.wait(), max(timeout, 0))
+        except asyncio.TimeoutError:
+            return False
+        return True
+
+    def notify_published(self):
+        """ Signal the completion of a publish to the waiting publisher, called from the client's network thread. """
+        published = self._published
+        if published is not None and self._event_loop is not None and not self._event_loop.is_closed():
+            self._event_loop.call_soon_threadsafe(published.set)
+
+    async def shm_writer(self, pipe, ring):
+        """ Queue interpreter packing records directly into the free region of a shared memory ring. """
+        packer = pipe['struct']
+        count = 0
+        self.reduce(pipe)
+        while self.queued(pipe) and self._is_started:
+            region = ring.writable()
+            slots = len(region) // packer.size
+            if not slots:
+                # Ring is full, leaving the remaining records queued until the reader catches up
+                break
+            chunk = self.take(pipe, slots)
+            ring.commit(chunk.pack_into(packer, region, 0))
+            count += len(chunk)
+        if count:
+            self.activity_queue.put(count)
 
-    async def tcp_writer(self, pipe, loop_iteration_at_init):
-        """ Queue interpreter to direct output stream. """
+    async def udp_writer(self, key, pipe, transport, sequence):
+        """ Queue interpreter packing whole records into datagrams, returns the sequence number of the next record. """
+        packer = pipe['struct']
+        header_size = base.datagramHeaderSize(key)
+        slots = max((MAX_DATAGRAM_BYTE_SIZE - header_size) // packer.size, 1)
+        count = 0
+        self.reduce(pipe)
+        while self.queued(pipe) and self._is_started:
+            # A new buffer per datagram, as the transport may hold on to it where the send is deferred
+            datagram = bytearray(header_size + (slots * packer.size))
+            base.packDatagramHeader(datagram, key, sequence)
+            chunk = self.take(pipe, slots)
+            written = len(chunk)
+            chunk.pack_into(packer, datagram, header_size)
+            transport.sendto(datagram if written == slots else datagram[:header_size + (written * packer.size)],
+                             (self._endpoint.ip_address, self._endpoint.port))
+            sequence += written
+            count += written
+            await asyncio.sleep(0)
+        if count:
+            self.activity_queue.put(count)
+        return sequence
+
+    async def tcp_writer(self, key, pipe, loop_iteration_at_init, compression=None):
+        """
+        Queue interpreter to direct output stream, compressed as a whole where enabled.\n
+        Queued records are packed into a preallocated buffer of up to a block's worth of records, written (and drained)
+        at once rather than record by record.
+        """
         queue = pipe['queue']
         if not queue:
             return
         writer = None
-        wire_format = pipe['struct_format']
+        packer = pipe['struct']
+        slots = max(pipe['max_block_size'] // packer.size, 1)
+        write_buffer = bytearray(slots * packer.size)
+        view = memoryview(write_buffer)
         # -------------------------------------------------------------------------
         try:
             _, writer = await asyncio.open_connection(self._endpoint.ip_address, self._endpoint.port)
+            writer.write(base.packStreamPreamble(key))
             self._endpoint.is_active = True
-            print(f"{base.Style.OK}TCP sender reconnected{base.Style.EOS}")
-            while self._endpoint.is_active and self._is_started and (loop_iteration_at_init == self.loop_iteration):
-                while not queue.empty() and self._is_started:
-                    self.activity_queue.put(1)
-                    writer.write(struct.pack(wire_format, *queue.get()))
+            print(f"{base.Style.OK}TCP sender of the {key} stream reconnected{base.Style.EOS}")
+            compressor = compression.compressor() if compression else None
+            while self._is_started and (loop_iteration_at_init == self.loop_iteration):
+                is_written = False
+                self.reduce(pipe)
+                while self.queued(pipe) and self._is_started:
+                    chunk = self.take(pipe, slots)
+                    self.activity_queue.put(len(chunk))
+                    # The transport copies whatever it cannot send at once, so the buffer is reused for the next batch
+                    data = view[:chunk.pack_into(packer, write_buffer, 0)]
+                    writer.write(compressor.compress(data) if compressor else data)
+                    await writer.drain()
+                    is_written = True
+                if compressor and is_written:
+                    # Flush to a byte boundary, so the receiver can decompress everything sent so far
+                    writer.write(compressor.flush(zlib.Z_SYNC_FLUSH))
                     await writer.drain()
                 await asyncio.sleep(RECHECK_DATA_IN_QUEUE_INTERVAL)
         except Exception:
             if not self._is_started:
-                print(f"{base.Style.INFO}TCP sender disconnecting...{base.Style.EOS}")
+                print(f"{base.Style.INFO}TCP sender of the {key} stream disconnecting...{base.Style.EOS}")
             else:
-                print(f"{base.Style.INFO}TCP sender reconnecting...{base.Style.EOS}")
+                print(f"{base.Style.INFO}TCP sender of the {key} stream reconnecting...{base.Style.EOS}")
         finally:
             self._endpoint.is_active = False
-            if writer is asyncio.StreamWriter:
+            if writer:
                 writer.close()
@@ -0,0 +1,156 @@
+#!/usr/bin/python3.8
+# -*- coding: utf-8 -*-
+"""
+Record ring buffer type classes and functionality, shared by the ring backed transports
+"""
+
+import struct
+import time
+
+from multiprocessing import resource_tracker, shared_memory
+
+HEADER_SIZE = 64
+DEFAULT_RING_RECORDS = 2**16
+
+
+def shared_memory_name(uid, key):
+    """ Name of the shared memory block holding the ring of a sub-system's output stream. """
+    return f"oddimorf_{uid}_{key}"
+
+
+class RecordRing:
+    """
+    Single producer, single consumer ring buffer of fixed size records, held in a (shared) memory buffer.\n
+    The buffer starts with a header holding the capacity, record size, the monotonic write and read cursors (byte
+    counts) and the generation of the ring (set on creation), followed by the data region. As the capacity is a
+    multiple of the record size, a record never wraps around the end of the data region, allowing records to be
+    packed and read in place.
+    """
+
+    def __init__(self, buffer, record_size=0, initialize=False):
+        self._buffer = memoryview(buffer)
+        if initialize:
+            capacity = ((len(self._buffer) - HEADER_SIZE) // record_size) * record_size
+            struct.pack_into('<QQQQQ', self._buffer, 0, capacity, record_size, 0, 0, time.time_ns())
+        self._capacity, self._record_size = struct.unpack_from('<QQ', self._buffer, 0)
+        self._generation = struct.unpack_from('<Q', self._buffer, 32)[0]
+        self._data = self._buffer[HEADER_SIZE:HEADER_SIZE + self._capacity]
+
+    @staticmethod
+    def size_for(record_size, records=DEFAULT_RING_RECORDS):
+        """ Buffer size required for a ring holding the given number of records. """
+        return HEADER_SIZE + (record_size * records)
+
+    @property
+    def capacity(self):
+        """ Size (in bytes) of the data region. """
+        return self._capacity
+
+    @property
+    def record_size(self):
+        """ Size (in bytes) of an individual record. """
+        return self._record_size
+
+    @property
+    def generation(self):
+        """ Creation time (in nanoseconds) of the ring, telling a ring re-created under the same name apart. """
+        return self._generation
+
+    @property
+    def write_cursor(self):
+        """ Total number of bytes committed by the producer. """
+        return struct.unpack_from('<Q', self._buffer, 16)[0]
+
+    @property
+    def read_cursor(self):
+        """ Total number of bytes released by the consumer. """
+        return struct.unpack_from('<Q', self._buffer, 24)[0]
+
+    def empty(self):
+        """ Indicates if no whole record is available to the consumer. """
+        return (self.write_cursor - self.read_cursor) < self._record_size
+
+    def free(self):
+        """ Number of bytes available to the producer. """
+        return self._capacity - (self.write_cursor - self.read_cursor)
+
+    def writable(self):
+        """ View on the contiguous free region following the write cursor, up to the end of the data region. """
+        write_cursor = self.write_cursor
+        offset = write_cursor % self._capacity
+        free = self._capacity - (write_cursor - self.read_cursor)
+        return self._data[offset:offset + min(self._capacity - offset, free)]
+
+    def commit(self, nbytes):
+        """ Make bytes written into the writable region available to the consumer. """
+        struct.pack_into('<Q', self._buffer, 16, self.write_cursor + nbytes)
+
+    def write(self, data):
+        """ Copy as many whole records of the data as fit into the ring, returns the number of bytes written. """
+        data = memoryview(data).cast('B')
+        nbytes = min(len(data), self.free())
+        nbytes -= nbytes % self._record_size
+        written = 0
+        while written < nbytes:
+            region = self.writable()
+            count = min(len(region), nbytes - written)
+            region[:count] = data[written:written + count]
+            written += count
+            self.commit(count)
+        return written
+
+    def truncate(self):
+        """ Discard any partially written record, moving the write cursor back to the last whole record. """
+        write_cursor = self.write_cursor
+        partial = (write_cursor - self.read_cursor) % self._record_size
+        if partial:
+            struct.pack_into('<Q', self._buffer, 16, write_cursor - partial)
+
+    def readable(self):
+        """ Views on the whole records available to the consumer (two views where wrapping around the end). """
+        read_cursor = self.read_cursor
+        available = self.write_cursor - read_cursor
+        available -= available % self._record_size
+        offset = read_cursor % self._capacity
+        head = min(available, self._capacity - offset)
+        views = [self._data[offset:offset + head]] if head else []
+        if available > head:
+            views.append(self._data[:available - head])
+        return views
+
+    def release(self, nbytes):
+        """ Return bytes read through the readable views to the producer. """
+        struct.pack_into('<Q', self._buffer, 24, self.read_cursor + nbytes)
+
+    def clear(self):
+        """ Release all whole records available to the consumer. """
+        self.release(sum(map(len, self.readable())))
+
+    def close(self):
+        """ Release the views held on the underlying buffer. """
+        self._data.release()
+        self._buffer.release()
+
+
+def create_shared_ring(name, record_size, records=DEFAULT_RING_RECORDS):
+    """ Create (or re-create) a named shared memory block holding a ring of records, as the producer. """
+    size = RecordRing.size_for(record_size, records)
+    try:
+        block = shared_memory.SharedMemory(name, create=True, size=size)
+    except FileExistsError:
+        stale_block = shared_memory.SharedMemory(name)
+        stale_block.close()
+        stale_block.unlink()
+        block = shared_memory.SharedMemory(name, create=True, size=size)
+    return block, RecordRing(block.buf, record_size, initialize=True)
+
+
+def attach_shared_ring(name):
+    """ Attach to the named shared memory block holding a ring of records, as the consumer. """
+    block = shared_memory.SharedMemory(name)
+    # The consumer does not own the block, so it should not be unlinked by the resource tracker on exit
+    try:
+        resource_tracker.unregister(block._name, 'shared_memory')  # pylint: disable=protected-access
+    except Exception:
+        pass
+    return block, RecordRing(block.buf)
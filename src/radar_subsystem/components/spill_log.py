@@ -0,0 +1,155 @@
+#!/usr/bin/python3.8
+# -*- coding: utf-8 -*-
+"""
+Spill log type classes and functionality, buffering outbound payloads on disk while disconnected from the broker
+"""
+
+import glob
+import mmap
+import os
+import struct
+import tempfile
+
+from ..base import Style
+
+SEGMENT_SIZE = 2**22
+MAX_SEGMENTS = 64
+REPLAY_RATE = 100  # payloads per second
+LENGTH = struct.Struct('<I')
+
+
+def spill_directory(uid):
+    """ Default directory holding the spill logs of a sub-system's output streams. """
+    return os.path.join(tempfile.gettempdir(), f"oddimorf_{uid}_spill")
+
+
+class Segment:
+    """ Append-only, memory mapped file of length prefixed payloads, read back in the order appended. """
+
+    def __init__(self, path, size):
+        self._path = path
+        self._size = size
+        with open(path, 'w+b') as file:
+            file.truncate(size)
+            self._map = mmap.mmap(file.fileno(), size)
+        self._write_offset = 0
+        self._read_offset = 0
+        self._count = 0
+
+    @property
+    def count(self):
+        """ Number of payloads appended and not yet read. """
+        return self._count
+
+    def fits(self, payload):
+        """ Indicates if the payload fits in the remainder of the segment. """
+        return (self._write_offset + LENGTH.size + len(payload)) <= self._size
+
+    def append(self, payload):
+        """ Append a payload to the segment, which must fit. """
+        LENGTH.pack_into(self._map, self._write_offset, len(payload))
+        self._write_offset += LENGTH.size
+        self._map[self._write_offset:self._write_offset + len(payload)] = payload
+        self._write_offset += len(payload)
+        self._count += 1
+
+    def peek(self):
+        """ Oldest payload not yet read. """
+        length = LENGTH.unpack_from(self._map, self._read_offset)[0]
+        offset = self._read_offset + LENGTH.size
+        return self._map[offset:offset + length]
+
+    def pop(self):
+        """ Mark the oldest payload as read. """
+        self._read_offset += LENGTH.size + LENGTH.unpack_from(self._map, self._read_offset)[0]
+        self._count -= 1
+
+    def close(self):
+        """ Unmap and remove the segment file. """
+        self._map.close()
+        try:
+            os.remove(self._path)
+        except OSError:
+            pass
+
+
+class SpillLog:
+    """
+    Bounded log of the outbound payloads of a stream, spilled to disk while disconnected from the broker.\n
+    Payloads are appended to memory mapped segment files, held by the page cache rather than the process, and read
+    back in order on replay, with each segment removed once read. The log holds up to the configured number of
+    segments, beyond which its oldest segment is dropped to make room.
+    """
+
+    def __init__(self, directory, key, segment_size=SEGMENT_SIZE, max_segments=MAX_SEGMENTS, replay_rate=REPLAY_RATE):
+        self._directory = directory
+        self._key = key
+        self._segment_size = segment_size
+        self._max_segments = max(max_segments, 1)
+        self._replay_rate = replay_rate
+        self._segments = []
+        self._sequence = 0
+        self._count = 0
+        os.makedirs(directory, exist_ok=True)
+        # Segments left behind by an earlier run of the process cannot be replayed (not being indexed)
+        for path in glob.glob(os.path.join(directory, f"{key}_*.seg")):
+            try:
+                os.remove(path)
+            except OSError:
+                pass
+
+    @classmethod
+    def from_config(cls, value, directory, key):
+        """ Spill log of the data schema's spill setting (true or a dictionary of settings), None where disabled. """
+        if not value:
+            return None
+        if not isinstance(value, dict):
+            return cls(directory, key)
+        return cls(value['path'] if 'path' in value else directory, key,
+                   value['segmentSize'] if 'segmentSize' in value else SEGMENT_SIZE,
+                   value['segments'] if 'segments' in value else MAX_SEGMENTS,
+                   value['replayRate'] if 'replayRate' in value else REPLAY_RATE)
+
+    @property
+    def replay_rate(self):
+        """ Rate (in payloads per second) at which spilled payloads are published once reconnected. """
+        return self._replay_rate
+
+    def __len__(self):
+        return self._count
+
+    def append(self, payload):
+        """ Append a payload to the log, dropping the oldest segment where the log is full. """
+        if isinstance(payload, str):
+            payload = payload.encode('utf-8')
+        if not self._segments or not self._segments[-1].fits(payload):
+            if len(self._segments) >= self._max_segments:
+                dropped = self._segments.pop(0)
+                print(f"{Style.WARNING}Spill log of the {self._key} stream full, dropping {dropped.count} payload(s){Style.EOS}")
+                self._count -= dropped.count
+                dropped.close()
+            self._segments.append(Segment(
+                os.path.join(self._directory, f"{self._key}_{self._sequence:06d}.seg"),
+                max(self._segment_size, LENGTH.size + len(payload))))
+            self._sequence += 1
+        self._segments[-1].append(payload)
+        self._count += 1
+
+    def peek(self):
+        """ Oldest payload in the log. """
+        return self._segments[0].peek()
+
+    def pop(self):
+        """ Remove the oldest payload from the log, removing its segment once fully read. """
+        segment = self._segments[0]
+        segment.pop()
+        self._count -= 1
+        if not segment.count:
+            self._segments.pop(0).close()
+
+    def close(self):
+        """ Remove all segments of the log, discarding any payloads not yet replayed. """
+        for segment in self._segments:
+            segment.close()
+        self._segments = []
+        self._count = 0
@@ -6,17 +6,15 @@ Base sub-system definition
 
 import asyncio
 import json
-import ssl
 import threading
 
-import paho.mqtt.client as mqtt
-
 from geopy import Point
 
+from . import broker
 from . import controls
 from . import components
 
-from .base import Component, Control, DataItem, Endpoint, Protocol, Status, Style, dataTypesToFormat, dataTypesToSize
+from .base import Component, Compression, Control, DataItem, Endpoint, Protocol, Status, Style
 
 
 class Context:
@@ -27,7 +25,8 @@ class Context:
         self.module_uid = str.replace(config['uid'], '-', '')
         self.module_name = config['name']
         self._chain_uid = ""
-        self._input_channel = components.InputChannel(self.module_uid)
+        self._input_channel = components.InputChannel(
+            self.module_uid, config['inputQueue'] if 'inputQueue' in config else None)
         self._output_channel = components.OutputChannel(
             self.module_uid, config['dataSchema'] if 'dataSchema' in config else None)
         self._status = Status.UNKNOWN
@@ -144,11 +143,16 @@ class Context:
         # errors = self._input_channel.error_count + self._process.error_count + self._output_channel.error_count
         return "000000"
 
+    async def determine_dropped_count(self):
+        """ Returns the count of inbound items dropped under overload since the previous determination. """
+        return self._input_channel.take_dropped_count()
+
     async def rates_to_output(self):
         """ Returns determined throughput indicators from logged activity rates on sub-system components. """
         return json.dumps({
             'total': await self.determine_throughput_rate(),
-            'errors': await self.determine_error_count()
+            'errors': await self.determine_error_count(),
+            'dropped': await self.determine_dropped_count()
         })
 
     async def determine_status(self):
@@ -162,12 +166,34 @@ class Context:
         self._is_terminated = True
 
 
+def incoming_streams(chain_uid, payload):
+    """
+    Get the key, topic, layout, type and compression of each stream defined by an Incoming payload.\n
+    Topics may be given as stream keys (sharing the payload's source) or as objects with a key and an optional source,
+    layout, type and compression, allowing for fan-in from several sources. The payload's layout is either shared by
+    all of the streams or a dictionary of layouts by stream key, while its type (e.g. 'application/octet-stream' for
+    struct packed records) and compression apply to all of the streams.
+    """
+    streams = []
+    layouts = payload['layout'] if 'layout' in payload else None
+    for entry in payload['topics']:
+        if not isinstance(entry, dict):
+            entry = {'key': entry}
+        key = entry['key']
+        source = entry['source'] if 'source' in entry else payload['source'] if 'source' in payload else None
+        layout = entry['layout'] if 'layout' in entry else layouts.get(key) if isinstance(layouts, dict) else layouts
+        content_type = entry['type'] if 'type' in entry else payload['type'] if 'type' in payload else None
+        compression = entry['compression'] if 'compression' in entry else payload['compression'] if 'compression' in payload else None
+        topic = f"Chains/{chain_uid}/SubSystems/{source}/Data/{key}/Records" if source else key
+        streams.append((key, topic, layout, content_type, Compression.from_config(compression)))
+    return streams
+
+
 def on_connect(client, userdata, flags, result):
     """ The callback for CONNACK response from the server. """
     print(f"{Style.OK}MQTT controller connected{Style.EOS}")
     client.subscribe("SelectedChain")
     userdata.broker.is_active = True
-    client.is_connected = True
 
 
 def on_disconnect(client, userdata, result):
@@ -177,8 +203,6 @@ def on_disconnect(client, userdata, result):
     else:
         print(f"{Style.WARNING}MQTT controller disconnected.{Style.EOS}")
     userdata.broker.is_active = False
-    client.user_data_set("")
-    client.is_connected = False
 
 
 def on_message(client, userdata, msg):
@@ -250,16 +274,13 @@ def on_message(client, userdata, msg):
         else:
             payload = json.loads(str(msg.payload.decode('utf-8')))
             if payload and payload['protocol']:
-                endpoint = Endpoint(
-                    payload['protocol'], payload['ip'], payload['port'])
-                if "layout" in payload:
-                    userdata.input_channel.struct_format = dataTypesToFormat(
-                        payload['layout'])
-                    userdata.input_channel.struct_size = dataTypesToSize(
-                        payload['layout'])
-                for key in payload['topics']:
-                    userdata.input_channel.stream_key = key
-                    topic = f"Chains/{userdata.chain_uid}/SubSystems/{payload['source']}/Data/{key}/Records" if 'source' in payload else key
+                endpoint = Endpoint(payload['protocol'], payload['path'] if 'path' in payload else payload['ip'],
+                                    payload['port'] if 'port' in payload else 0)
+                if 'speed' in payload:
+                    userdata.input_channel.replay_speed = payload['speed']
+                userdata.input_channel.clear_streams()
+                for key, topic, layout, content_type, compression in incoming_streams(userdata.chain_uid, payload):
+                    userdata.input_channel.add_stream(key, topic, layout, content_type, compression)
                     endpoint.topics.append(topic)
                 userdata.input_channel.endpoint = endpoint
     # Define outgoing channel details
@@ -272,6 +293,11 @@ def on_message(client, userdata, msg):
             if payload and payload['protocol']:
                 new_endpoint = Endpoint(
                     payload['protocol'], payload['ip'], payload['port'])
+                userdata.output_channel.content_type = payload['type'] if 'type' in payload else None
+                userdata.output_channel.compression = Compression.from_config(
+                    payload['compression'] if 'compression' in payload else None)
+                userdata.output_channel.in_flight_window = payload['inFlight'] if 'inFlight' in payload else components.output_channel.MAX_IN_FLIGHT_MESSAGES
+                userdata.output_channel.qos = payload['qos'] if 'qos' in payload else 0
                 for key in userdata.output_channel.stream_keys:
                     topic = f"Chains/{userdata.chain_uid}/SubSystems/{userdata.module_uid}/Data/{key}/Records"
                     new_endpoint.topics.append(topic)
@@ -287,30 +313,15 @@ class Controller(Component):
 
     async def loop_async(self):
         """ Initialize the primary MQTT client, and effect the sub-system controller loop """
-        client = mqtt.Client(client_id=f"{self._context.module_uid}_control", clean_session=True,
-                             userdata=self._context, protocol=mqtt.MQTTv311, transport='tcp')
-        if self._context.broker.protocol == Protocol.MQTTS:
-            # Enables TLS1.2 with externally provided keys/certificates
-            client.tls_set(None, None, None, cert_reqs=ssl.CERT_NONE,
-                           tls_version=ssl.PROTOCOL_TLSv1_2, ciphers=None)
-            # disables peer verification
-            client.tls_insecure_set(True)
-        # -------------------------------------------------------------------------
-        client.is_connected = False
-        client.on_connect = on_connect
-        client.on_message = on_message
-        client.on_disconnect = on_disconnect
+        connection = broker.acquire_connection(self._context.broker, self._context.module_uid)
+        listener = broker.Listener(self._context, on_connect, on_disconnect, on_message)
+        connection.add_listener(listener)
+        client = connection.client
         status_loop_counter = 0
         counter = 0
         # -------------------------------------------------------------------------
-        print(f"{Style.INFO}MQTT subscriber connecting on {self._context.broker.ip_address}:{self._context.broker.port}{' with TLS support' if self._context.broker.protocol == Protocol.MQTTS else ''}...{Style.EOS}")
-        client.connect_async(self._context.broker.ip_address,
-                             self._context.broker.port, 60)
-        # -------------------------------------------------------------------------
-        # Initialize connection to the broker as configured
-        client.loop_start()
         # Wait for connection setup to complete
-        while not client.is_connected:
+        while not connection.is_connected:
             await asyncio.sleep(1)
         # -------------------------------------------------------------------------
         # Non-event driven loop, primarily to allow for publishing of system states on a polled basis
@@ -367,8 +378,8 @@ class Controller(Component):
             await asyncio.sleep(1)
         # -------------------------------------------------------------------------
         print(f"{Style.INFO}MQTT controller disconnecting...{Style.EOS}")
-        client.disconnect()
-        client.loop_stop()
+        connection.remove_listener(listener)
+        broker.release_connection(connection)
 
     async def start_async(self):
         """ Asynchronously sets the flag that governs ongoing thread loops and creates a new worker thread. """
@@ -19,6 +19,8 @@ setup(name='oddimorf',
       classifiers=[],
       install_requires=[
           'paho-mqtt'],
+      extras_require={
+          'numpy': ['numpy']},
       python_requires='>=3.8',
       project_urls={
           'Source': 'https://github.com/RaedanWulfe/oddimorf',
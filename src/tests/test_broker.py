@@ -0,0 +1,38 @@
+#!/usr/bin/python3.8
+# -*- coding: utf-8 -*-
+"""
+Shared broker connection tests
+"""
+
+from radar_subsystem import base, broker
+
+
+def test_subscriptions_may_change_while_renewed_on_reconnection():
+    connection = broker.BrokerConnection(base.Endpoint('MQTT', '127.0.0.1', 9), 'C_broker')
+    connection.subscribe('a', lambda client, userdata, msg: None, None)
+    renewed = []
+
+    class Client:
+        # A channel subscribing from its worker thread as the network thread renews the subscriptions
+        def subscribe(self, topic):
+            renewed.append(topic)
+            connection.subscribe(f"{topic}/b", lambda client, userdata, msg: None, None)
+
+    connection._on_connect(Client(), None, None, 0)
+    assert renewed == ['a']
+    connection.unsubscribe('a')
+    connection.unsubscribe('a/b')
+
+
+def test_client_ids_are_not_reused_after_a_release():
+    endpoints = [base.Endpoint('MQTT', '127.0.0.1', 9), base.Endpoint('MQTT', '127.0.0.2', 9)]
+    first = broker.acquire_connection(endpoints[0], 'C')
+    second = broker.acquire_connection(endpoints[1], 'C')
+    broker.release_connection(second)
+    third = broker.acquire_connection(endpoints[1], 'C')
+    try:
+        client_ids = {connection.client._client_id for connection in (first, second, third)}
+        assert len(client_ids) == 3
+    finally:
+        broker.release_connection(third)
+        broker.release_connection(first)
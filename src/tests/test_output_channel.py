@@ -0,0 +1,329 @@
+#!/usr/bin/python3.8
+# -*- coding: utf-8 -*-
+"""
+Output channel component tests
+"""
+
+import asyncio
+import csv
+import io
+import queue
+import threading
+import time
+import zlib
+
+import numpy
+
+from radar_subsystem import base
+from radar_subsystem.components import record_ring
+from radar_subsystem.components import spill_log
+from radar_subsystem.components.output_channel import MQTT_SEND_INTERVAL, OutputChannel, RecordChunk
+
+CELL_COUNT = 2500  # more cells than a block of the grid stream holds
+
+
+def grid_channel():
+    """ Output channel with a delta encoded grid stream, started for the writers to run without a connection. """
+    channel = OutputChannel('P', [{
+        'key': 'ClutterMap',
+        'dataTypes': 'float,float,uint32',
+        'header': 'Lat,Lon,Intensity',
+        'delta': {'value': 'Intensity', 'keyframe': 'PT1H'}}])
+    channel._is_started = True
+    return channel, channel.pipes['ClutterMap']
+
+
+def scan(channel, changes=None):
+    """ Enqueue a full scan of the grid, with changed intensities by cell index. """
+    changes = changes or {}
+    channel.put_many('ClutterMap', [[float(i % 50), float(i // 50), changes.get(i, 10)] for i in range(CELL_COUNT)])
+
+
+def publish(channel, pipe, block):
+    """ Run encoder cycles over the queued records until drained, returns the published records. """
+    while channel.queued(pipe):
+        channel.reduce(pipe)
+        channel.mqtt_binary_writer(block, pipe)
+    records = []
+    while not block['payloads'].empty():
+        records.extend(pipe['struct'].iter_unpack(block['payloads'].get_nowait()))
+    return records
+
+
+def test_delta_keyframe_exceeding_a_block_is_published_in_full():
+    channel, pipe = grid_channel()
+    block = {'payloads': queue.SimpleQueue(), 'compression': None}
+    assert channel.block_records(pipe, True) < CELL_COUNT
+    scan(channel)
+    records = publish(channel, pipe, block)
+    assert len(records) == CELL_COUNT
+    assert len({record[:2] for record in records}) == CELL_COUNT
+
+
+def test_delta_changes_exceeding_a_block_are_published_in_full():
+    channel, pipe = grid_channel()
+    block = {'payloads': queue.SimpleQueue(), 'compression': None}
+    scan(channel)
+    publish(channel, pipe, block)
+    changes = {index: 20 for index in range(CELL_COUNT) if index % 5}
+    scan(channel, changes)
+    records = publish(channel, pipe, block)
+    assert len(records) == len(changes)
+    assert all(record[2] == 20 for record in records)
+    scan(channel, changes)
+    assert publish(channel, pipe, block) == []
+
+
+def test_queued_record_count_covers_rows_and_chunks_until_taken():
+    channel, pipe = grid_channel()
+    pipe['queue'].put([0.0, 0.0, 1])
+    scan(channel)
+    assert pipe['queue'].count == CELL_COUNT + 1
+    chunk = channel.take(pipe, 1000)
+    assert len(chunk) == 1000
+    assert pipe['queue'].count == CELL_COUNT + 1 - 1000
+    channel.take(pipe, CELL_COUNT)
+    assert pipe['queue'].count == 0
+
+
+def test_latency_target_defaults_to_send_interval_rather_than_refresh_period():
+    channel = OutputChannel('P', [{'key': 'Tracks', 'dataTypes': 'uint32', 'refreshPeriod': 'PT90S'}])
+    assert channel.pipes['Tracks']['latency_target'] == MQTT_SEND_INTERVAL
+
+
+def test_record_queue_wakes_waiter_once_count_reached():
+    channel, pipe = grid_channel()
+    timer = threading.Timer(0.1, pipe['queue'].put, (RecordChunk([[0.0, 0.0, 1]] * 100),))
+    timer.start()
+    start = time.monotonic()
+    assert pipe['queue'].wait_count(100, 5)
+    assert time.monotonic() - start < 1
+    assert not pipe['queue'].wait_count(101, 0.05)
+
+
+class LinkDroppingClient:
+    """ MQTT client stand-in failing its publishes at QoS 0 while the link is down, ahead of on_disconnect. """
+
+    class Message:
+        def __init__(self, rc):
+            self.rc = rc
+
+        def is_published(self):
+            return not self.rc
+
+    def __init__(self):
+        self.is_link_up = True
+        self.sent = []
+
+    def publish(self, topic, payload, qos=0):
+        if not self.is_link_up:
+            return self.Message(4)
+        self.sent.append(payload)
+        return self.Message(0)
+
+
+def test_spilled_payloads_survive_publishes_failing_on_a_dropped_link(tmp_path):
+    channel = OutputChannel('P', [{'key': 'Tracks', 'dataTypes': 'uint32', 'spill': {'replayRate': 10000}}])
+    channel.endpoint = base.Endpoint('MQTT', 'localhost', 1883)
+    channel._is_started = True
+    client = LinkDroppingClient()
+    block = {'topic': 'Tracks', 'payloads': queue.SimpleQueue(), 'spill': spill_log.SpillLog(str(tmp_path), 'Tracks'),
+             'replay_credit': 0, 'replay_time': 0}
+
+    async def publish(payloads):
+        for payload in payloads:
+            block['payloads'].put(payload)
+        await channel.mqtt_sender(client, block)
+
+    async def run():
+        channel._event_loop = asyncio.get_running_loop()
+        channel._published = asyncio.Event()
+        channel.endpoint.is_active = False
+        await publish([b'%d' % i for i in range(10)])
+        # Reconnected, with the link dropping again ahead of the disconnect callback
+        channel.endpoint.is_active = True
+        client.is_link_up = False
+        await asyncio.sleep(0.01)
+        await publish([b'%d' % i for i in range(10, 20)])
+        assert len(block['spill']) == 20
+        client.is_link_up = True
+        while block['spill']:
+            await asyncio.sleep(0.01)
+            await publish([])
+
+    asyncio.run(run())
+    block['spill'].close()
+    assert client.sent == [b'%d' % i for i in range(20)]
+
+
+RAW_TYPES = 'uint64,float'
+RAW_COUNT = 5000
+
+
+def raw_channel(protocol, address='127.0.0.1', port=0):
+    """ Output channel with a raw stream, started for the writers to run without the connection loop. """
+    channel = OutputChannel('P', [{'key': 'Raw', 'dataTypes': RAW_TYPES}])
+    channel.endpoint = base.Endpoint(protocol, address, port)
+    channel._is_started = True
+    return channel, channel.pipes['Raw']
+
+
+def put_raw(channel):
+    """ Enqueue the raw records in halves, as rows and as a NumPy array chunk. """
+    half = RAW_COUNT // 2
+    channel.put_many('Raw', [[i, 0.5] for i in range(half)])
+    array = numpy.zeros(RAW_COUNT - half, base.dataTypesToDtype(RAW_TYPES))
+    array[array.dtype.names[0]] = numpy.arange(half, RAW_COUNT)
+    array[array.dtype.names[1]] = 0.5
+    channel.put_array('Raw', array)
+
+
+def sequence_numbers(pipe, data):
+    """ First fields of the records packed in the data. """
+    return [record[0] for record in pipe['struct'].iter_unpack(data)]
+
+
+def test_array_chunks_are_packed_into_shared_memory_rings():
+    channel, pipe = raw_channel('SHM')
+    ring = record_ring.RecordRing(bytearray(record_ring.RecordRing.size_for(pipe['struct'].size, RAW_COUNT)),
+                                  pipe['struct'].size, initialize=True)
+    put_raw(channel)
+    asyncio.run(channel.shm_writer(pipe, ring))
+    assert sequence_numbers(pipe, b''.join(ring.readable())) == list(range(RAW_COUNT))
+
+
+def test_array_chunks_are_packed_into_datagrams():
+    channel, pipe = raw_channel('UDP', port=9)
+
+    class Transport:
+        def __init__(self):
+            self.datagrams = []
+
+        def sendto(self, data, address):
+            self.datagrams.append(bytes(data))
+
+    transport = Transport()
+    put_raw(channel)
+    assert asyncio.run(channel.udp_writer('Raw', pipe, transport, 0)) == RAW_COUNT
+    records = b''.join(base.unpackDatagram(datagram)[2].tobytes() for datagram in transport.datagrams)
+    assert sequence_numbers(pipe, records) == list(range(RAW_COUNT))
+
+
+def receive_tcp(compression):
+    """ Send the raw records through the TCP writer to a loopback server, returns the pipe and the bytes received. """
+    received = bytearray()
+
+    async def run():
+        async def serve(reader, _):
+            while not reader.at_eof():
+                received.extend(await reader.read(65536))
+
+        server = await asyncio.start_server(serve, '127.0.0.1', 0)
+        channel, pipe = raw_channel('TCP', port=server.sockets[0].getsockname()[1])
+        put_raw(channel)
+        writer = asyncio.ensure_future(channel.tcp_writer('Raw', pipe, channel.loop_iteration, compression))
+        preamble = base.packStreamPreamble('Raw')
+        deadline = time.monotonic() + 5
+        while time.monotonic() < deadline:
+            data = bytes(received[len(preamble):])
+            if compression:
+                data = zlib.decompressobj().decompress(data)
+            if len(data) >= RAW_COUNT * pipe['struct'].size:
+                break
+            await asyncio.sleep(0.05)
+        channel._is_started = False
+        await asyncio.wait_for(writer, 5)
+        server.close()
+        await server.wait_closed()
+        return pipe, preamble
+
+    pipe, preamble = asyncio.run(run())
+    assert bytes(received[:len(preamble)]) == preamble
+    data = bytes(received[len(preamble):])
+    return pipe, zlib.decompressobj().decompress(data) if compression else data
+
+
+def test_array_chunks_are_sent_over_tcp():
+    pipe, data = receive_tcp(None)
+    assert sequence_numbers(pipe, data) == list(range(RAW_COUNT))
+
+
+def test_array_chunks_are_sent_over_compressed_tcp():
+    pipe, data = receive_tcp(base.Compression())
+    assert sequence_numbers(pipe, data) == list(range(RAW_COUNT))
+
+
+def test_records_are_spilled_while_the_broker_is_unreachable_from_the_start(tmp_path):
+    channel = OutputChannel('P', [{'key': 'Tracks', 'dataTypes': 'uint32,float', 'latencyTarget': 'PT0.05S',
+                                   'spill': {'path': str(tmp_path)}}])
+    # Nothing listens on the discard port, so the client never connects
+    channel.endpoint = base.Endpoint('MQTT', '127.0.0.1', 9)
+    channel.endpoint.topics.append('Chains/c/SubSystems/P/Data/Tracks/Records')
+
+    async def run():
+        await channel.start_async()
+        channel.put_many('Tracks', [[i, 1.0] for i in range(1000)])
+        deadline = time.monotonic() + 5
+        while channel.pipes['Tracks']['queue'].count and (time.monotonic() < deadline):
+            await asyncio.sleep(0.05)
+        await asyncio.sleep(0.2)
+        spilled = len(channel._blocks['Tracks']['spill'])
+        await channel.stop_async()
+        return spilled
+
+    assert asyncio.run(run()) > 0
+    assert channel.pipes['Tracks']['queue'].count == 0
+
+
+def csv_block():
+    """ Block of a CSV stream, as set up by the MQTT publisher. """
+    write_buffer = io.BytesIO()
+    text_buffer = io.TextIOWrapper(write_buffer, encoding='utf-8', newline='', write_through=True)
+    return {'write_buffer': write_buffer, 'text_buffer': text_buffer,
+            'writer': csv.writer(text_buffer, quoting=csv.QUOTE_NONNUMERIC),
+            'payloads': queue.SimpleQueue(), 'compression': None}
+
+
+def test_csv_writer_publishes_all_queued_records_in_one_call():
+    channel = OutputChannel('P', [{'key': 'Tracks', 'dataTypes': 'uint32,float', 'maxBlockSize': 200}])
+    channel._is_started = True
+    pipe = channel.pipes['Tracks']
+    for i in range(60):
+        pipe['queue'].put([i, 0.5])
+    channel.put_many('Tracks', [[i, 0.5] for i in range(60, 101)])
+    block = csv_block()
+    channel.mqtt_writer(block, pipe)
+    rows = []
+    while not block['payloads'].empty():
+        payload = block['payloads'].get_nowait()
+        assert len(payload) <= 200
+        rows.extend(csv.reader(io.StringIO(payload.decode('utf-8'))))
+    assert [int(row[0]) for row in rows] == list(range(101))
+    assert not channel.queued(pipe) and (pipe['queue'].count == 0)
+
+
+def test_csv_block_records_follow_the_size_of_the_rows_written():
+    channel = OutputChannel('P', [{'key': 'Tracks', 'dataTypes': 'uint32,float', 'maxBlockSize': 1000}])
+    channel._is_started = True
+    pipe = channel.pipes['Tracks']
+    assert channel.block_records(pipe, False) is None
+    channel.put_many('Tracks', [[1000, 0.5]] * 10)
+    channel.mqtt_writer(csv_block(), pipe)
+    # Rows of "1000,0.5\r\n" take 10 bytes each
+    assert channel.block_records(pipe, False) == 100
+
+
+def test_conflated_records_beyond_a_block_are_published_in_one_call():
+    channel = OutputChannel('P', [{'key': 'Tracks', 'dataTypes': 'uint32,float', 'maxBlockSize': 120,
+                                   'conflate': 0}])
+    channel._is_started = True
+    pipe = channel.pipes['Tracks']
+    channel.put_many('Tracks', [[i % 100, float(i)] for i in range(300)])
+    block = {'payloads': queue.SimpleQueue(), 'compression': None}
+    channel.reduce(pipe)
+    channel.mqtt_binary_writer(block, pipe)
+    records = []
+    while not block['payloads'].empty():
+        records.extend(pipe['struct'].iter_unpack(block['payloads'].get_nowait()))
+    assert sorted(record[0] for record in records) == list(range(100))
+    assert not channel.queued(pipe)